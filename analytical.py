@@ -1,4 +1,5 @@
 from math import exp, log
+import numpy as np
 
 # Solve for an analytical solution of the triple decay chain at time t given initial conditions
 def analyticalSolution(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final, t):
@@ -13,6 +14,24 @@ def analyticalSolution(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final, t
 
     return (N_A, N_B, N_C)
 
+# Solve for the analytical solution at every time in t at once, returning contiguous float64 arrays of N_A, N_B, and N_C
+def analyticalSolutions(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final, t):
+    # Fall back to the scalar solution if a single time is given
+    if np.ndim(t) == 0:
+        return analyticalSolution(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final, t)
+
+    # Evaluate each exponential only once for the whole time array
+    t = np.asarray(t, dtype = np.float64)
+    expA = np.exp(-lambda_A * t)
+    expB = np.exp(-lambda_B * t)
+
+    # Same equations as analyticalSolution with the exponentials reused
+    N_A = N_A0 * expA
+    N_B = N_B0 * expB + (lambda_A * N_A0) * (expA - expB) / (lambda_B - lambda_A)
+    N_C = N_C0 + N_B0 * (1 - expB) + N_A0 * (lambda_B * (1 - expA) - lambda_A * (1 - expB)) / (lambda_B - lambda_A)
+
+    return (N_A, N_B, N_C)
+
 def calculateAnalyticalMaxN_B(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final):
     # d/dt(N_B) = 0
     # N_B = N_B0 * exp(-lambda_B * t) + (lambda_A * N_A0) * (exp(-lambda_A * t) - exp(-lambda_B * t)) / (lambda_B - lambda_A)
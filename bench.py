@@ -0,0 +1,179 @@
+from inspect import getsourcefile
+from os.path import abspath, dirname, isfile
+from os import chdir, cpu_count
+from platform import platform, python_version
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import subprocess
+import sys
+import tracemalloc
+import numpy as np
+
+from analytical import analyticalSolutions, calculateAnalyticalMaxN_B
+from numerical import numericalSolutions, calculateNumericalMaxN_B
+from check import checkRepeat
+from pipeline import solveChunk, levelChunks
+from read import readOutput
+from write import writeOutput
+from instrument import getPeakRSS
+
+
+# Times shorter than this are mostly the overhead of calling the stage, so they aren't used for scaling exponents or compared with the baseline
+minimumTime = 0.001
+
+def timeStage(stage, repeats):
+    # Return the shortest time of the repeated calls, which is the one least disturbed by other processes
+    best = float('inf')
+    for i in range(max(1, repeats)):
+        start = perf_counter()
+        stage()
+        best = min(best, perf_counter() - start)
+    return best
+
+def timeStartup(directory, repeats):
+    # Time starting python and importing main.py from the directory in a new process, which is the time a run takes before it calculates anything
+    # The process must import main without loading matplotlib or process pools, which are only loaded when they are used
+    command = [sys.executable, '-c', 'import main']
+    return timeStage(lambda: subprocess.run(command, cwd = directory, check = True), repeats)
+
+def measureMemory(stage):
+    # Return the most bytes allocated at once during a call, numpy's arrays are included in the traced memory
+    tracemalloc.start()
+    stage()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def getScalingExponent(results):
+    # Fit time = c * rows ^ k to the sizes which take long enough to measure, k is 1 for a stage which scales linearly
+    results = [result for result in results if result['seconds'] >= minimumTime]
+    if len(results) < 2:
+        return None
+    return float(np.polyfit(np.log([result['rows'] for result in results]), np.log([result['seconds'] for result in results]), 1)[0])
+
+def getStages(options, settings, significance, initialValues, power, paths):
+    # Return the function to time for each stage at a size of 2 ^ power steps, with everything the stage needs calculated beforehand
+    t_final = initialValues[-1]
+    values = (*initialValues[:-2], t_final / 2 ** power, t_final)
+    previousValues = (*initialValues[:-2], t_final / 2 ** (power - 1), t_final)
+    rows = int(values[-1] // values[-2] + 1)
+    steps = np.arange(rows)
+    integrator = settings['integrator']
+    tolerance = significance * sum(values[2:5]) / 100
+    path = 'output' + str(power) + '.txt'
+    stages = {}
+
+    if 'analytical' in options['stages']:
+        t = steps * values[-2]
+        stages['analytical'] = lambda: analyticalSolutions(*values, t)
+    if 'numerical' in options['stages']:
+        stages['numerical'] = lambda: numericalSolutions(*values, steps, integrator, tolerance)
+
+    # The output file is written even if only later stages are timed, since they read it
+    chunks = list(levelChunks(values, integrator, tolerance, settings['chunkSize']))
+    maxN_B = (calculateAnalyticalMaxN_B(*values), calculateNumericalMaxN_B(chunks, values[-2]))
+    write = lambda: writeOutput(open(path, 'w'), chunks, values, *maxN_B)
+    if 'write' in options['stages']:
+        stages['write'] = write
+    else:
+        write()
+    paths.append(path)
+
+    if 'read' in options['stages']:
+        stages['read'] = lambda: readOutput(open(path, 'r'))
+    if 'check' in options['stages']:
+        previous = solveChunk(previousValues, integrator, tolerance, np.arange(int(previousValues[-1] // previousValues[-2] + 1)), analytical = False)
+        fine = solveChunk(values, integrator, tolerance, steps, analytical = False)
+        stages['check'] = lambda: checkRepeat(previous, fine, significance)
+    if 'plot' in options['stages']:
+        # Loaded output files are cached by plotting, so the cache is emptied to time reading them each time
+        import plotting
+        finePaths = [paths[max(0, len(paths) - 3)], paths[max(0, len(paths) - 2)], path]
+        stages['plotN_Bvs_t'] = lambda: (plotting.datasetCache.clear(), plotting.plotN_Bvs_t(*finePaths, 'imageN_B.png'))
+        stages['plotNumerical'] = lambda: (plotting.datasetCache.clear(), plotting.plotNumerical(path, 'imageNumerical.png'))
+        stages['plotMaxN_BvsDelta_t'] = lambda: plotting.plotMaxN_BvsDelta_t(list(paths), 'imageMaxN_BVsDt.png')
+    return (rows, stages)
+
+def runBenchmarks(options, settings, significance, initialValues, directory):
+    # Time the startup once, since it doesn't depend on the number of steps
+    results = {}
+    if 'startup' in options['stages']:
+        seconds = timeStartup(directory, options['repeats'])
+        results['startup'] = {'results' : [{'power' : None, 'rows' : 1, 'seconds' : seconds, 'rowsPerSecond' : 1 / seconds, 'peakBytes' : None}]}
+        print('startup {:.3g} s'.format(seconds))
+
+    # Time every other stage at each size, from the fewest steps to the most
+    paths = []
+    for power in range(options['minPower'], options['maxPower'] + 1):
+        (rows, stages) = getStages(options, settings, significance, initialValues, power, paths)
+        for name, stage in stages.items():
+            seconds = timeStage(stage, options['plotRepeats'] if name[:4] == 'plot' else options['repeats'])
+            results.setdefault(name, {'results' : []})['results'].append({'power' : power, 'rows' : rows, 'seconds' : seconds,
+                'rowsPerSecond' : rows / seconds if seconds > 0 else None, 'peakBytes' : measureMemory(stage)})
+        print('2 ^ {} steps: '.format(power) + ', '.join('{} {:.3g} s'.format(name, results[name]['results'][-1]['seconds']) for name in stages))
+
+    # Get how each stage's time grows with the number of rows
+    for name in results:
+        results[name]['scalingExponent'] = getScalingExponent(results[name]['results'])
+    return results
+
+def compareBudget(results, budget):
+    # List the startup if it took longer than the budget, as a regression from a baseline which took the budget
+    if 'startup' not in results or results['startup']['results'][0]['seconds'] <= budget:
+        return []
+    return [{'stage' : 'startup', 'rows' : 1, 'rowsPerSecond' : results['startup']['results'][0]['rowsPerSecond'], 'baselineRowsPerSecond' : 1 / budget}]
+
+def compareBaseline(results, baseline, regression):
+    # List each stage and size which has fewer rows per second than the baseline by more than the regression
+    regressions = []
+    for name in results:
+        if name not in baseline['stages']:
+            continue
+        baselineResults = {result['rows'] : result for result in baseline['stages'][name]['results']}
+        for result in results[name]['results']:
+            old = baselineResults.get(result['rows'])
+            if old == None or old['seconds'] < minimumTime or result['rowsPerSecond'] == None:
+                continue
+            if result['rowsPerSecond'] < old['rowsPerSecond'] * (1 - regression):
+                regressions.append({'stage' : name, 'rows' : result['rows'], 'rowsPerSecond' : result['rowsPerSecond'], 'baselineRowsPerSecond' : old['rowsPerSecond']})
+    return regressions
+
+
+if __name__ == '__main__':
+    from read import readBench, readInput, readSettings
+    from write import getOutputNumber
+
+    # Get the directory of bench.py and make it the current working directory
+    directory = dirname(abspath(getsourcefile(lambda:0)))
+    chdir(directory)
+
+    # Read the bench file, the input file for the decay rates, counts, and final time, and the settings file for the integrator and chunk size
+    options = readBench(open('bench.txt'))
+    initialValues = readInput(open('input.txt'))
+    (run, generate, multiple, significance, plot, *plotInfo, settings) = readSettings(open('settings.txt'))
+    baseline = json.load(open(options['baseline'])) if isfile(options['baseline']) else None
+
+    # Run the benchmarks in a temporary directory so that the output files and images they write don't replace any in this directory
+    with TemporaryDirectory() as temporaryDirectory:
+        chdir(temporaryDirectory)
+        results = runBenchmarks(options, settings, significance, initialValues, directory)
+        chdir(directory)
+
+    # Write the results and the machine they were measured on, along with any regressions from the baseline
+    report = {'version' : 1, 'python' : python_version(), 'numpy' : np.__version__, 'platform' : platform(), 'cpus' : cpu_count(),
+        'integrator' : settings['integrator'], 'chunkSize' : settings['chunkSize'], 'peakRSS' : getPeakRSS(), 'stages' : results,
+        'regressions' : compareBudget(results, options['startupBudget']) + (compareBaseline(results, baseline, options['regression']) if baseline != None else [])}
+    json.dump(report, open('bench' + getOutputNumber(directory, 'bench', '.json') + '.json', 'w'), indent = 1)
+    if options['saveBaseline']:
+        json.dump(report, open(options['baseline'], 'w'), indent = 1)
+
+    # Print the regressions and exit with an error if there are any so that scripts running the benchmarks can catch them
+    # The startup is a single row, so it is printed as the time it took
+    for regression in report['regressions']:
+        if regression['stage'] == 'startup':
+            print('Regression in startup: {:.4g} s, baseline {:.4g} s'.format(1 / regression['rowsPerSecond'], 1 / regression['baselineRowsPerSecond']))
+        else:
+            print('Regression in {stage} at {rows} rows: {rowsPerSecond:.4g} rows/s, baseline {baselineRowsPerSecond:.4g} rows/s'.format(**regression))
+    if len(report['regressions']) > 0:
+        sys.exit(1)
@@ -0,0 +1,101 @@
+from hashlib import sha256
+from os import link, makedirs, remove, replace, stat
+from os.path import isfile, join
+from shutil import copyfile
+from time import time
+from compression import compressionExtensions, findFile
+
+
+# Cached output files are kept in this directory of the output directory, named by the key of the values which produced them
+cacheDirectory = 'cache'
+
+# Change the version if the output files change so that old cached files aren't used
+cacheVersion = 2
+
+def getCacheKey(initialValues, integrator, tolerance, schedule = None, compression = 'none'):
+    # The output files only depend on the input values and the integrator, the tolerance if the integrator is adaptive, the output schedule if only some steps are written,
+    # and the compression if the output file is compressed
+    # repr keeps every digit of the floats and distinguishes integer times, which are written differently
+    values = (cacheVersion, *initialValues, integrator, tolerance if integrator == 'adaptive' else None)
+    if schedule != None:
+        values += (schedule,)
+    if compression != 'none':
+        values += (compression,)
+    return sha256(repr(values).encode()).hexdigest()[:32]
+
+def linkFile(source, destination):
+    # Hard link the file so that no space is used, or copy it if the file system doesn't allow links
+    try:
+        link(source, destination)
+    except OSError:
+        copyfile(source, destination)
+
+def unshareFile(path):
+    # Replace a file linked to the cache with a copy of it so that it can be changed without changing the cached file
+    copyfile(path, path + '.tmp')
+    replace(path + '.tmp', path)
+
+def findCached(registry, directory, key, binary):
+    # Check that the key is cached with a binary sidecar if one is needed and that its files weren't removed
+    row = registry.execute('SELECT binary FROM cache WHERE key = ?', (key,)).fetchone()
+    if row == None or (binary and not row[0]):
+        return False
+    path = join(directory, cacheDirectory, key)
+    return findFile(path + '.txt') != None and (not row[0] or isfile(path + '.bin'))
+
+def findComparison(registry, key, significance):
+    # Whether the cached level changed significantly from the previous level, or None if it wasn't compared with the same significance
+    row = registry.execute('SELECT changed FROM cache WHERE key = ? AND significance = ?', (key, significance)).fetchone()
+    return None if row == None or row[0] == None else bool(row[0])
+
+def storeComparison(registry, key, significance, changed):
+    # Record whether the cached level changed significantly from the previous level so that it isn't solved again to compare it when it is used
+    registry.execute('UPDATE cache SET significance = ?, changed = ? WHERE key = ?', (significance, changed, key))
+    registry.commit()
+
+def useCached(registry, directory, key, fileNum, binary):
+    # Link the cached files to the output files of the run, with the compression's extension of the cached output file
+    path = join(directory, cacheDirectory, key)
+    source = findFile(path + '.txt')
+    linkFile(source, join(directory, 'output' + fileNum + source[len(path):]))
+    if binary:
+        linkFile(path + '.bin', join(directory, 'output' + fileNum + '.bin'))
+
+    # Mark the key as used
+    registry.execute('UPDATE cache SET lastUsed = ? WHERE key = ?', (time(), key))
+    registry.commit()
+
+def storeCached(registry, directory, key, fileNum, binary, maxBytes):
+    # Link the output files of a run into the cache
+    makedirs(join(directory, cacheDirectory), exist_ok = True)
+    path = join(directory, cacheDirectory, key)
+    removeCached(path)
+    size = 0
+
+    # The output file is linked with its compression's extension
+    output = join(directory, 'output' + fileNum)
+    for extension in [findFile(output + '.txt')[len(output):]] + (['.bin'] if binary else []):
+        linkFile(join(directory, 'output' + fileNum + extension), path + extension)
+        size += stat(path + extension).st_size
+    registry.execute('INSERT OR REPLACE INTO cache (key, bytes, binary, lastUsed) VALUES (?, ?, ?, ?)', (key, size, binary, time()))
+    registry.commit()
+
+    # Keep the cache within its size
+    evictCached(registry, directory, maxBytes)
+
+def evictCached(registry, directory, maxBytes):
+    # Remove the least recently used files until the cache is no larger than maxBytes
+    # Output files linked to removed cache files are kept since only the cache's link is removed
+    total = registry.execute('SELECT COALESCE(SUM(bytes), 0) FROM cache').fetchone()[0]
+    while total > maxBytes:
+        (key, size) = registry.execute('SELECT key, bytes FROM cache ORDER BY lastUsed LIMIT 1').fetchone()
+        removeCached(join(directory, cacheDirectory, key))
+        registry.execute('DELETE FROM cache WHERE key = ?', (key,))
+        total -= size
+    registry.commit()
+
+def removeCached(path):
+    # Remove the cached files of a key, with any compression's extension
+    for extension in ['.txt' + compression for compression in compressionExtensions.values()] + ['.bin']:
+        if isfile(path + extension):
+            remove(path + extension)
@@ -0,0 +1,94 @@
+from functools import lru_cache
+from inspect import getsourcefile
+from os.path import abspath, dirname
+from os import chdir
+import numpy as np
+
+
+# Build the decay matrix of a chain where dN/dt = M N
+# lambdas[i] is the decay constant of member i and branches is a list of (parent, daughter, ratio) index tuples
+def makeDecayMatrix(lambdas, branches):
+    n = len(lambdas)
+    M = np.zeros((n, n))
+
+    # Each member decays at its own rate
+    for i in range(n):
+        M[i, i] = -lambdas[i]
+
+    # A member without branches decays entirely into the next member, or out of the chain if it is the last member
+    parents = {parent for parent, daughter, ratio in branches}
+    for i in range(n - 1):
+        if i not in parents:
+            M[i + 1, i] += lambdas[i]
+
+    # Otherwise each branch feeds its ratio of the parent's decays into the daughter
+    for parent, daughter, ratio in branches:
+        # Daughters must come after their parents so that the matrix is lower triangular
+        if daughter <= parent:
+            raise(Exception('Error in chain, members must be listed before the members they decay into'))
+        M[daughter, parent] += ratio * lambdas[parent]
+
+    return M
+
+# The decay matrix of each chain is built once so that any number of times can be evaluated
+@lru_cache(maxsize = 32)
+def getDecayMatrix(lambdas, branches):
+    # lambdas and branches are tuples so that they can be used as a cache key
+    return makeDecayMatrix(lambdas, branches)
+
+# The exponentials of this many times are calculated at once, which bounds the memory used for long chains and many times
+exponentialTimes = 4096
+
+# The Taylor series of the exponential is summed to this degree, its next term is less than 1e-17 of the sum since the scaled matrix is at most 1 / 2
+taylorDegree = 16
+
+def chainExponentials(M, t):
+    # exp(M t) for each time in t by scaling and squaring, which stays exact however close the decay rates are, unlike the Bateman coefficients
+    # M t is divided by 2 ^ s so that its norm is at most 1 / 2, then the exponential of the scaled matrix is squared s times
+    s = max(0, int(np.ceil(np.log2(max(np.abs(M).sum(axis = 0).max() * np.max(t, initial = 0), 1e-300)))) + 1)
+    A = np.multiply.outer(t / 2 ** s, M)
+
+    # The exponential is kept as I + F, since I + F would round away most of F when the members decay slowly compared to the fastest one
+    # F = A + A^2 / 2! + A^3 / 3! + ... and (I + F)^2 = I + (2 F + F^2)
+    I = np.eye(len(M))
+    F = A / taylorDegree
+    for k in range(taylorDegree - 1, 0, -1):
+        F = A @ (I + F) / k
+    for square in range(s):
+        F = 2 * F + F @ F
+    return I + F
+
+# Solve for every member of the chain at each time in t, returning an array with a row for each time and a column for each member
+def chainSolution(lambdas, branches, counts, t):
+    M = getDecayMatrix(tuple(lambdas), tuple(branches))
+
+    # N(t) = exp(M t) N0, calculated for a block of times at a time
+    t = np.asarray(t, dtype = np.float64)
+    counts = np.array(counts, dtype = np.float64)
+    N = np.empty((*t.shape, len(counts)))
+    flat = N.reshape(-1, len(counts))
+    times = t.reshape(-1)
+    for start in range(0, len(times), exponentialTimes):
+        flat[start : start + exponentialTimes] = chainExponentials(M, times[start : start + exponentialTimes]) @ counts
+    return N
+
+
+if __name__ == '__main__':
+    from read import readChain
+    from write import writeChainOutput, getOutputNumber
+
+    # Get the directory of chain.py and make it the current working directory
+    directory = dirname(abspath(getsourcefile(lambda:0)))
+    chdir(directory)
+
+    # Read the chain file and solve for every member every delta_t between 0 <= t <= t_final
+    names, lambdas, counts, branches, delta_t, t_final = readChain(open('chain.txt'))
+    steps = np.arange(int(t_final // delta_t + 1))
+    N = chainSolution(lambdas, branches, counts, steps * delta_t)
+
+    # Keep the t = 0 time as an integer as it was given, the rest are multiples of delta_t
+    t = (steps * delta_t).tolist()
+    t[0] = 0
+
+    # Write the output file
+    writeChainOutput(open('chain' + getOutputNumber(directory, 'chain') + '.txt', 'w'), t, N, names, lambdas, counts, branches, delta_t, t_final)
@@ -0,0 +1,58 @@
+from os import makedirs, remove, replace
+from os.path import dirname, isfile, join
+import json
+
+
+# Checkpoints of levels which are being solved are kept in this directory of the output directory, named by the cache key of the level's values
+# A checkpoint is removed when its level is finished, so a checkpoint is only found for a level which was interrupted
+checkpointDirectory = 'checkpoints'
+
+# Change the version if the checkpoints change so that old checkpoints aren't resumed
+checkpointVersion = 1
+
+def getCheckpointPath(directory, key):
+    return join(directory, checkpointDirectory, key + '.json')
+
+def saveCheckpoint(path, checkpoint):
+    # Write the checkpoint to a temporary file and replace the last checkpoint with it, so that an interruption while saving leaves the last checkpoint
+    makedirs(dirname(path), exist_ok = True)
+    checkpointFile = open(path + '.tmp', 'w')
+    json.dump({'version' : checkpointVersion, **checkpoint}, checkpointFile)
+    checkpointFile.close()
+    replace(path + '.tmp', path)
+
+def loadCheckpoint(path):
+    # Return the checkpoint, or None if there isn't one or it was saved by another version
+    if path == None or not isfile(path):
+        return None
+    try:
+        checkpoint = json.load(open(path, 'r'))
+    except ValueError:
+        return None
+    return checkpoint if checkpoint.get('version') == checkpointVersion else None
+
+def removeCheckpoint(path):
+    if path != None and isfile(path):
+        remove(path)
+
+def makeMaxSaver(path, checkpoint):
+    # Return a function for findNumericalMaxN_B which saves the checkpoint with the rows searched and the max N_B and its time found in them
+    def save(rows, maxN_B):
+        checkpoint.update({'phase' : 'max', 'rows' : rows, 'maxN_B' : maxN_B})
+        saveCheckpoint(path, checkpoint)
+    return save
+
+def makeWriteSaver(path, interval, checkpoint, changed):
+    # Return a function for writeOutput which saves the checkpoint with the rows written and the position after them every interval chunks,
+    # along with whether any count has changed significantly from the previous level so far
+    # The files are flushed first so that everything before the position is on the disk when the checkpoint is saved
+    chunks = [0]
+    def save(rows, outputFile, binaryFile):
+        chunks[0] += 1
+        if chunks[0] % interval == 0:
+            outputFile.flush()
+            if binaryFile != None:
+                binaryFile.flush()
+            checkpoint.update({'phase' : 'write', 'rows' : rows, 'textBytes' : outputFile.tell(), 'changed' : len(changed) > 0})
+            saveCheckpoint(path, checkpoint)
+    return save
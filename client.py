@@ -0,0 +1,44 @@
+from http.client import HTTPConnection
+from inspect import getsourcefile
+from os.path import abspath, dirname
+from os import chdir
+import json
+import sys
+
+
+def solveScenarios(scenarios, port = 8765, host = '127.0.0.1'):
+    # Send scenarios to the service and yield the result of each as it is given back, in the order of the scenarios
+    # Each scenario is a dictionary with the text of an input file as "input" or the input values by name, see service.py
+    connection = HTTPConnection(host, port)
+    connection.request('POST', '/solve', json.dumps(list(scenarios)), {'Content-Type' : 'application/json'})
+    response = connection.getresponse()
+    if response.status != 200:
+        raise(Exception('The service gave ' + str(response.status) + ' ' + response.reason))
+    for line in response:
+        yield json.loads(line)
+    connection.close()
+
+def solveInput(inputText, port = 8765, host = '127.0.0.1', **scenario):
+    # Solve one scenario given as the text of an input file in the same format as input.txt
+    return next(solveScenarios([{'input' : inputText, **scenario}], port, host))
+
+
+if __name__ == '__main__':
+    from read import readService
+
+    # Get the directory of client.py and make it the current working directory
+    directory = dirname(abspath(getsourcefile(lambda:0)))
+    chdir(directory)
+
+    # Solve each file given, which is an input file like input.txt or a JSON file of a scenario or a list of scenarios, or input.txt if none are given
+    scenarios = []
+    for path in sys.argv[1:] or ['input.txt']:
+        if path[-5:] == '.json':
+            scenario = json.load(open(path))
+            scenarios += scenario if isinstance(scenario, list) else [scenario]
+        else:
+            scenarios.append({'input' : open(path).read()})
+
+    # Print each result as a line of JSON as it is given back
+    for result in solveScenarios(scenarios, readService(open('service.txt'))['port']):
+        print(json.dumps(result))
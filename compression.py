@@ -0,0 +1,34 @@
+from os.path import isfile
+import bz2
+import gzip
+import lzma
+
+
+# Output files may be compressed with any of these, named by adding the compression's extension to the name of the output file
+compressionExtensions = {'none' : '', 'gzip' : '.gz', 'lzma' : '.xz', 'bz2' : '.bz2'}
+openers = {'.gz' : gzip.open, '.xz' : lzma.open, '.bz2' : bz2.open}
+
+def openFile(path, mode = 'r'):
+    # Open a text file, compressing or decompressing it a block at a time as it is written or read if its name ends with a compression's extension
+    # Appending to a compressed file adds another compressed stream after it, which is read as if the file was written at once
+    for extension, opener in openers.items():
+        if path.endswith(extension):
+            return opener(path, mode + 't')
+    return open(path, mode)
+
+def isCompressed(path):
+    return any(path.endswith(extension) for extension in openers)
+
+def removeCompression(path):
+    # Return the name of the file without the compression's extension
+    for extension in openers:
+        if path.endswith(extension):
+            return path[:-len(extension)]
+    return path
+
+def findFile(path):
+    # Return the path of the file with any compression's extension added, or None if there isn't one
+    for extension in compressionExtensions.values():
+        if isfile(path + extension):
+            return path + extension
+    return None
@@ -0,0 +1,122 @@
+from inspect import getsourcefile
+from os.path import abspath, dirname
+from os import chdir
+import numpy as np
+from analytical import calculateAnalyticalMaxN_B
+from pipeline import solveChunk
+
+
+# The counts which are compared, numerical and analytical
+speciesNames = (('N_An', 'N_Aa'), ('N_Bn', 'N_Ba'), ('N_Cn', 'N_Ca'))
+
+# Errors smaller than this fraction of the total count are rounding errors, which don't shrink with the time delta
+roundingError = 1e-10
+
+# Observed orders below the least order don't show that the levels converge, so they aren't extrapolated
+# The order of the max N_B time is kept below the greatest order, since 2 ^ p - 1 is divided by in the extrapolation
+leastOrder = 0.5
+greatestOrder = 8
+
+def solveLevels(initialValues, integrator, tolerance, levels):
+    # Solve the level of the initial values and each level with half the time delta of the one before it, keeping every level in memory
+    data = []
+    for level in range(levels):
+        values = (*initialValues[:-2], initialValues[-2] / 2 ** level, initialValues[-1])
+        data.append((values, solveChunk(values, integrator, tolerance, np.arange(int(values[-1] // values[-2] + 1)))))
+    return data
+
+def getNorms(error, delta_t):
+    # Return the largest error and the L2 norm of the error over time
+    # The L2 norm is weighted by the time delta so that levels with different numbers of steps can be compared
+    return {'max' : float(np.max(np.abs(error))), 'L2' : float(np.sqrt(delta_t * np.sum(error ** 2)))}
+
+def getErrorNorms(data, delta_t):
+    # Return the norms of the error of each numerical count against the analytical count
+    return {numerical[:-1] : getNorms(data[numerical] - data[analytical], delta_t) for (numerical, analytical) in speciesNames}
+
+def getObservedOrder(coarseError, fineError, rounding = 0):
+    # Halving the time delta divides the error of a method of order p by 2 ^ p, errors at rounding can't give an order
+    if coarseError <= rounding or fineError <= rounding:
+        return None
+    return float(np.log2(coarseError / fineError))
+
+def getMaxTime(data):
+    # Find the time of the numerical max N_B between the steps by fitting a quartic through the largest step and the two steps on either side of it
+    # The time is otherwise a multiple of delta_t, which would be too coarse to extrapolate, and a quartic keeps the error of the fit below that of fourth order integrators
+    i = int(np.argmax(data.N_Bn))
+    if i < 2 or i > len(data) - 3:
+        return float(data.t[i])
+    delta_t = data.t[i] - data.t[i - 1]
+    fit = np.polynomial.Polynomial.fit(np.arange(-2, 3), data.N_Bn[i - 2 : i + 3], 4, domain = [-2, 2], window = [-2, 2])
+
+    # The max is where the slope of the quartic is 0 within a step of the largest step
+    steps = [root.real for root in fit.deriv().roots() if abs(root.imag) < 1e-12 and -1 <= root.real <= 1]
+    if len(steps) == 0:
+        return float(data.t[i])
+    return float(data.t[i] + delta_t * max(steps, key = fit))
+
+def extrapolate(coarse, fine, order):
+    # Richardson extrapolation of a value found with a time delta and half of it by a method of the given order, removing the leading error term
+    return (2 ** order * fine - coarse) / (2 ** order - 1)
+
+def analyzeConvergence(initialValues, integrator, tolerance, levels):
+    # Solve the levels in memory and find the error norms of each level, the observed order of each pair of levels,
+    # and the Richardson extrapolation of the counts and the max N_B time from the two finest levels
+    data = solveLevels(initialValues, integrator, tolerance, max(2, levels))
+    analyticalMaxTime = calculateAnalyticalMaxN_B(*initialValues)[1]
+    results = []
+    for (values, level) in data:
+        results.append({'delta_t' : values[-2], 'rows' : len(level), 'norms' : getErrorNorms(level, values[-2]), 'maxTime' : getMaxTime(level)})
+
+    # The observed order of each count between each level and the next, from the largest errors
+    rounding = roundingError * sum(initialValues[2:5])
+    for coarse, fine in zip(results[:-1], results[1:]):
+        fine['orders'] = {name : getObservedOrder(coarse['norms'][name]['max'], fine['norms'][name]['max'], rounding) for name in fine['norms']}
+
+    # Extrapolate with the order observed for N_B between the two finest levels, rounded to the nearest whole order
+    # The finest level is used as it is if its errors are already at rounding, such as for the exponential integrator, if the levels don't converge,
+    # or for the adaptive integrator, whose errors depend on its tolerance instead of the time delta
+    order = results[-1]['orders']['N_B']
+    if integrator == 'adaptive':
+        (order, reason) = (None, "the adaptive integrator's errors depend on its tolerance instead of the time delta")
+    elif order == None:
+        reason = 'the errors of the finest level are at rounding'
+    elif order < leastOrder:
+        (order, reason) = (None, 'the levels don\'t converge with an order of at least ' + str(leastOrder))
+    else:
+        (order, reason) = (max(1, round(order)), None)
+    ((coarseValues, coarse), (fineValues, fine)) = data[-2:]
+    extrapolated = {'order' : order, 'reason' : reason}
+    if order != None:
+        # The counts are extrapolated at the steps of the coarser level, which are every other step of the finer level
+        extrapolated['norms'] = {numerical[:-1] : getNorms(extrapolate(coarse[numerical], fine[numerical][::2], order) - coarse[analytical], coarseValues[-2])
+            for (numerical, analytical) in speciesNames}
+
+        # The max N_B time also has the error of finding it between the steps, so its order is observed from how much it changes between the three finest levels if there are three
+        # (T_1 - T_0) / (T_2 - T_1) = 2 ^ p when the time converges with order p, an order below the least order is replaced by the order of the counts
+        times = [result['maxTime'] for result in results[-3:]]
+        timeOrder = getObservedOrder(times[1] - times[0], times[2] - times[1]) if len(times) == 3 and (times[1] - times[0]) * (times[2] - times[1]) > 0 else None
+        timeOrder = order if timeOrder == None or timeOrder < leastOrder else min(timeOrder, greatestOrder)
+        extrapolated['maxTime'] = extrapolate(times[-2], times[-1], timeOrder)
+    else:
+        extrapolated['norms'] = results[-1]['norms']
+        extrapolated['maxTime'] = results[-1]['maxTime']
+    return (results, extrapolated, analyticalMaxTime)
+
+
+if __name__ == '__main__':
+    from read import readInput, readSettings
+    from write import writeConvergenceOutput, getOutputNumber
+
+    # Get the directory of convergence.py and make it the current working directory
+    directory = dirname(abspath(getsourcefile(lambda:0)))
+    chdir(directory)
+
+    # Read the input file, and the settings file for the integrator, significance, and number of levels
+    initialValues = readInput(open('input.txt'))
+    (run, generate, multiple, significance, plot, *plotInfo, settings) = readSettings(open('settings.txt'))
+    tolerance = significance * sum(initialValues[2:5]) / 100
+
+    # Analyze the levels and write the results to a numbered convergence file
+    (results, extrapolated, analyticalMaxTime) = analyzeConvergence(initialValues, settings['integrator'], tolerance, settings['convergenceLevels'])
+    writeConvergenceOutput(open('convergence' + getOutputNumber(directory, 'convergence') + '.txt', 'w'), initialValues, settings['integrator'], results, extrapolated, analyticalMaxTime)
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+# Names of the columns of the data tables in the order they are written
+# a denotes analytical and n denotes numerical
+columnNames = ('t', 'N_Aa', 'N_Ba', 'N_Ca', 'N_An', 'N_Bn', 'N_Cn', 'N_total')
+
+class Dataset:
+    # Rows of the data tables kept as one contiguous array of floats for each column instead of a tuple for each row
+    # columns is a list of 1 dimensional arrays of the same length, named by names in the same order
+    def __init__(self, columns, names = columnNames):
+        if len(columns) != len(names):
+            raise(Exception('Expected a column for each of ' + ', '.join(names)))
+        self.columns = list(columns)
+        self.names = tuple(names)
+
+    def __len__(self):
+        # The number of rows
+        return len(self.columns[0]) if len(self.columns) > 0 else 0
+
+    def __getitem__(self, key):
+        # A name gives that column without copying it
+        if isinstance(key, str):
+            return self.columns[self.names.index(key)]
+
+        # Anything else picks rows of every column, slices of rows are views of the columns
+        return Dataset([column[key] for column in self.columns], self.names)
+
+    def __getattr__(self, name):
+        # The columns may also be used as attributes, such as data.N_Bn
+        names = self.__dict__.get('names', ())
+        if name in names:
+            return self.columns[names.index(name)]
+        raise AttributeError(name)
+
+    def __iter__(self):
+        # Unpacking a dataset gives its columns in order
+        return iter(self.columns)
+
+    def select(self, names):
+        # Return a dataset of only the named columns, which are the same arrays as in this dataset
+        return Dataset([self[name] for name in names], names)
+
+def emptyDataset(rows, names = columnNames):
+    # Make a dataset with every column in one contiguous block, one column after another
+    block = np.empty((len(names), rows))
+    return Dataset(list(block), names)
+
+def joinDatasets(datasets, names = columnNames):
+    # Put the rows of the datasets together in order, each column is copied once into a new contiguous column
+    datasets = list(datasets)
+    if len(datasets) == 0:
+        return emptyDataset(0, names)
+    return Dataset([np.concatenate(columns) for columns in zip(*(data.columns for data in datasets))], datasets[0].names)
@@ -0,0 +1,158 @@
+from functools import partial
+from inspect import getsourcefile
+from os.path import abspath, dirname
+from os import chdir, cpu_count
+import numpy as np
+from analytical import analyticalSolutions
+from numerical import numericalSolutions
+from pipeline import getScheduleSteps
+
+
+# Counts are kept as 64 bit integers, so the total count must be less than this
+maxCount = 2 ** 62
+
+# The histograms of a block of times from one batch are at most this many bytes, so the times are simulated in blocks
+maxHistogramBytes = 2 ** 24
+
+def getTransitionProbabilities(lambda_A, lambda_B, interval):
+    # The probability of an atom of A being A, B, or C after the interval, and of an atom of B being B or C
+    # These are exact for any interval since each atom decays independently, so the realizations don't depend on the time delta
+    stayA = np.exp(-lambda_A * interval)
+    stayB = np.exp(-lambda_B * interval)
+    if lambda_A == lambda_B:
+        AtoB = lambda_A * interval * stayA
+    else:
+        AtoB = lambda_A * (stayA - stayB) / (lambda_B - lambda_A)
+    return ((stayA, AtoB, max(0.0, 1 - stayA - AtoB)), stayB)
+
+def getBinWidth(total, bins):
+    # The width of the histogram bins of the counts, 1 if every count from 0 to the total has its own bin
+    return total // bins + 1
+
+def startBatch(seed, realizations, initialValues):
+    # Every realization of a batch starts with the initial counts, the batch is given its random number generator and the time it has reached
+    (N_A, N_B, N_C) = (np.full(realizations, int(N0), dtype = np.int64) for N0 in initialValues[2:5])
+    return (np.random.default_rng(seed), N_A, N_B, N_C, None)
+
+# Continue a batch of realizations through a block of times and return the batch after the last time with the statistics of each count at each time,
+# without keeping the realizations at earlier times
+# The statistics are the number of realizations, the mean and sum of squared differences from the mean of each count, and a histogram of each count, indexed by time and then A, B, C
+def simulateBatch(batch, initialValues, times, bins):
+    (random, N_A, N_B, N_C, lastTime) = batch
+    (lambda_A, lambda_B, N_A0, N_B0, N_C0) = initialValues[:5]
+    total = int(N_A0 + N_B0 + N_C0)
+    binWidth = getBinWidth(total, bins)
+
+    means = np.empty((len(times), 3))
+    squares = np.empty((len(times), 3))
+    histograms = np.zeros((len(times), 3, total // binWidth + 1), dtype = np.int64)
+    for i in range(len(times)):
+        # Draw where the atoms of A and B of every realization are after the interval from the last time
+        # The atoms of A are split between A, B, and C by one multinomial draw for each realization
+        if lastTime != None and times[i] > lastTime:
+            (fromA, stayB) = getTransitionProbabilities(lambda_A, lambda_B, times[i] - lastTime)
+            splitA = random.multinomial(N_A, fromA)
+            leftB = random.binomial(N_B, stayB)
+            N_C = N_C + splitA[:, 2] + (N_B - leftB)
+            N_B = leftB + splitA[:, 1]
+            N_A = splitA[:, 0]
+        lastTime = times[i]
+
+        # Add the counts at this time to the statistics
+        for j, N in enumerate((N_A, N_B, N_C)):
+            means[i, j] = N.mean()
+            squares[i, j] = ((N - means[i, j]) ** 2).sum()
+            histograms[i, j] = np.bincount(N // binWidth, minlength = histograms.shape[2])
+    return ((random, N_A, N_B, N_C, lastTime), (len(N_A), means, squares, histograms))
+
+def keepBatches(results, batches):
+    # Keep each batch to continue it in the next block and give its statistics to be combined
+    for (batch, statistics) in results:
+        batches.append(batch)
+        yield statistics
+
+def combineBatches(results):
+    # Combine the statistics of the batches as they are given, the means and squared differences are combined without summing large squares
+    (count, means, squares, histograms) = (0, 0.0, 0.0, 0)
+    for (batchCount, batchMeans, batchSquares, batchHistograms) in results:
+        difference = batchMeans - means
+        squares = squares + batchSquares + difference ** 2 * count * batchCount / (count + batchCount)
+        means = means + difference * batchCount / (count + batchCount)
+        count += batchCount
+        histograms = histograms + batchHistograms
+    return (count, means, squares / max(1, count - 1), histograms)
+
+def getPercentiles(histograms, count, percentiles, binWidth):
+    # Find the bin of each count at each time which holds each percentile of the realizations, returned as the lowest count in the bin
+    cumulative = np.cumsum(histograms, axis = -1)
+    # The 0th percentile is the bin of the first realization, the lowest count
+    return [(cumulative < max(1, np.ceil(percentile / 100 * count))).sum(axis = -1) * binWidth for percentile in percentiles]
+
+def simulateBlocks(mapper, batches, initialValues, times, options, blockLength):
+    # Simulate the batches through each block of times in turn, continuing each batch from where it was at the end of the last block
+    # The batches of a block are combined as they are given and the percentiles of the block are found before the next block is simulated,
+    # so only the histograms of one block are held at once
+    (means, variances, percentiles) = ([], [], [])
+    binWidth = getBinWidth(int(sum(initialValues[2:5])), options['bins'])
+    for start in range(0, len(times), blockLength):
+        block = partial(simulateBatch, initialValues = initialValues, times = times[start : start + blockLength], bins = options['bins'])
+        (results, batches) = (mapper(block, batches), [])
+        (count, blockMeans, blockVariances, histograms) = combineBatches(keepBatches(results, batches))
+        means.append(blockMeans)
+        variances.append(blockVariances)
+        percentiles.append(getPercentiles(histograms, count, options['percentiles'], binWidth))
+    return (np.concatenate(means), np.concatenate(variances), [np.concatenate(percentile) for percentile in zip(*percentiles)])
+
+def runEnsemble(initialValues, options, schedule = None):
+    # The realizations count whole atoms
+    counts = initialValues[2:5]
+    if any(N % 1 != 0 or N < 0 for N in counts) or sum(counts) >= maxCount:
+        raise(Exception('Error in input.txt, an ensemble needs whole numbers of atoms with a total count less than ' + str(maxCount)))
+
+    # Record the realizations at every step or the steps written to the output files
+    steps = getScheduleSteps(schedule, initialValues)
+    if steps is None:
+        steps = np.arange(int(initialValues[-1] // initialValues[-2] + 1))
+    times = steps * initialValues[-2]
+
+    # Split the realizations into batches, each with its own seed spawned from the seed so that the results don't depend on how the batches are split between the workers
+    sizes = [min(options['batchSize'], options['realizations'] - start) for start in range(0, options['realizations'], options['batchSize'])]
+    batches = [startBatch(seed, size, initialValues) for (seed, size) in zip(np.random.SeedSequence(options['seed']).spawn(len(sizes)), sizes)]
+
+    # The histograms of every time would take too much memory for long runs with many bins, so each block of times has histograms of at most maxHistogramBytes from each batch
+    # Each batch keeps drawing from its own generator from one block to the next, so the results don't depend on the blocks either
+    bins = int(sum(counts)) // getBinWidth(int(sum(counts)), options['bins']) + 1
+    blockLength = max(1, maxHistogramBytes // (3 * bins * 8))
+
+    # Simulate the batches in this process if only one worker is asked for, otherwise split them between a pool of processes
+    workers = options['workers'] if options['workers'] > 0 else cpu_count()
+    if workers == 1 or len(sizes) == 1:
+        (means, variances, percentiles) = simulateBlocks(map, batches, initialValues, times, options, blockLength)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(min(workers, len(sizes))) as executor:
+            (means, variances, percentiles) = simulateBlocks(executor.map, batches, initialValues, times, options, blockLength)
+    return (steps, times, means, variances, percentiles)
+
+
+if __name__ == '__main__':
+    from read import readEnsemble, readInput, readSettings
+    from write import writeEnsembleOutput, getOutputNumber
+
+    # Get the directory of ensemble.py and make it the current working directory
+    directory = dirname(abspath(getsourcefile(lambda:0)))
+    chdir(directory)
+
+    # Read the ensemble file, the input file for the decay rates, counts, and times, and the settings file for the integrator and output schedule
+    options = readEnsemble(open('ensemble.txt'))
+    initialValues = readInput(open('input.txt'))
+    (run, generate, multiple, significance, plot, *plotInfo, settings) = readSettings(open('settings.txt'))
+
+    # Simulate the ensemble and find the analytical and numerical solutions at the same times
+    (steps, times, means, variances, percentiles) = runEnsemble(initialValues, options, settings['outputSchedule'])
+    tolerance = significance * sum(initialValues[2:5]) / 100
+    analytical = analyticalSolutions(*initialValues, times)
+    numerical = numericalSolutions(*initialValues, steps, settings['integrator'], tolerance)[:3]
+
+    # Write the statistics of the ensemble alongside the analytical and numerical solutions
+    writeEnsembleOutput(open('ensemble' + getOutputNumber(directory, 'ensemble') + '.txt', 'w'), initialValues, options, times, analytical, numerical, means, variances, percentiles)
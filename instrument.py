@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+from time import perf_counter
+import sys
+import tracemalloc
+
+# The peak resident memory of the process is only available on Unix
+try:
+    from resource import getrusage, RUSAGE_SELF
+except ImportError:
+    getrusage = None
+
+
+# Hooks are functions which are called with the level, stage, seconds, and peak bytes every time a stage is measured
+# They are called in the process the stage ran in, so hooks added in main aren't called for levels solved in other processes
+hooks = []
+
+# The measured stages of each level keyed by the level's output file number, stages outside of a level are kept under None
+# Each stage has its total seconds, the number of times it was measured, and the most bytes allocated at once if memory is traced
+records = {}
+currentLevel = None
+enabled = False
+
+# The finished levels of the run in order, each with its stages
+levels = []
+
+def addHook(hook):
+    # Call the hook every time a stage is measured
+    hooks.append(hook)
+
+def startInstruments(traceMemory = False):
+    # Start measuring stages, tracing the memory allocated in each if asked for, which slows down every allocation
+    global enabled
+    enabled = True
+    if traceMemory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def beginLevel(level):
+    # Keep the stages measured from now on with the level
+    global currentLevel
+    currentLevel = level
+
+def endLevel(level):
+    # Stop keeping stages with the level and return its stages, which are removed so that they are only reported once
+    global currentLevel
+    currentLevel = None
+    return records.pop(level, {})
+
+def addLevel(level, initialValues, cached, stages):
+    # Keep a finished level with its stages, which may have been measured in another process
+    levels.append({'level' : level, 'delta_t' : initialValues[-2], 'rows' : int(initialValues[-1] // initialValues[-2] + 1), 'cached' : bool(cached), 'stages' : stages})
+
+def getReport():
+    # Return the levels of the run and the stages measured outside of them, along with the total of each stage over the whole run
+    totals = {}
+    for stages in [level['stages'] for level in levels] + [records.get(None, {})]:
+        for stage, record in stages.items():
+            total = totals.setdefault(stage, {'seconds' : 0.0, 'calls' : 0, 'peakBytes' : None})
+            total['seconds'] += record['seconds']
+            total['calls'] += record['calls']
+            if record['peakBytes'] != None:
+                total['peakBytes'] = max(total['peakBytes'] or 0, record['peakBytes'])
+    return {'levels' : levels, 'runStages' : records.get(None, {}), 'totals' : totals}
+
+@contextmanager
+def measure(stage):
+    # Measure the time and memory of the code in the with block as the named stage of the current level
+    if not enabled and len(hooks) == 0:
+        yield
+        return
+
+    # The peak memory is reset so that it is the most allocated during this stage, or since the last stage inside of it, above what was allocated before it
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        allocated = tracemalloc.get_traced_memory()[0]
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - allocated if tracing else None
+
+        # Add the measurement to the totals of the stage
+        record = records.setdefault(currentLevel, {}).setdefault(stage, {'seconds' : 0.0, 'calls' : 0, 'peakBytes' : None})
+        record['seconds'] += seconds
+        record['calls'] += 1
+        if peak != None:
+            record['peakBytes'] = max(record['peakBytes'] or 0, peak)
+        for hook in hooks:
+            hook(currentLevel, stage, seconds, peak)
+
+def getPeakRSS():
+    # Return the most resident memory used by the process in bytes, ru_maxrss is in kilobytes on Linux and bytes on macOS
+    # It never goes down so it is only given for the whole run, the memory of each stage is measured with tracemalloc instead
+    if getrusage == None:
+        return None
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def getProfileSummary(profiler, count = 30):
+    # Return the functions which took the most time including the functions they called, with their calls and times
+    import pstats
+    stats = pstats.Stats(profiler).sort_stats('cumulative')
+    summary = []
+    for (file, line, function) in stats.fcn_list[:count]:
+        (primitiveCalls, calls, ownSeconds, seconds, callers) = stats.stats[(file, line, function)]
+        summary.append({'function' : '{}:{}({})'.format(file, line, function), 'calls' : calls, 'ownSeconds' : ownSeconds, 'seconds' : seconds})
+    return summary
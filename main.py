@@ -1,71 +1,200 @@
+from collections import deque
+from functools import partial
 from inspect import getsourcefile
-from os.path import abspath, dirname
-from os import chdir
+from os.path import abspath, dirname, isfile
+from os import chdir, remove
+from time import perf_counter
 from read import readInput, readSettings
-from write import writeOutput, getOutputNumber
-from analytical import analyticalSolution, calculateAnalyticalMaxN_B
-from numerical import numericalSolution, calculateNumericalMaxN_B
-from plotting import makeReferenceGraph, makeFinalGraphs
-from check import checkRepeat
-from matplotlib.pyplot import show, clf
-
-def main(run, generate, multiple, significance, initialValues = None, previousData = None):
-    if run:
-        # Open the output file to be written
-        fileNum = getOutputNumber(directory)
-        outputFile = open('output' + fileNum + '.txt', 'w')
-
-        # Open and read the input file or use previous initial values with half time delta
-        if initialValues != None:
-            initialValues = (*initialValues[:-2], initialValues[-2] / 2, initialValues[-1])
-
-        else:
-            inputFile = open("input.txt", 'r')
-            initialValues = readInput(inputFile)
-        lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final = initialValues
-
-        # Preallocate space for the data so that it may be populated with tuple references
-        size = int(t_final // delta_t + 1)
-        data = size * [None]
-
-        # Skip calculations of the t = 0 data point because the initial conditions are given
-        data[0] = (0, N_A0, N_B0, N_C0, N_A0, N_B0, N_C0, N_A0 + N_B0 + N_C0)
-        previousValues = data[0]
-
-        # Calculate the analytical and numerical solutions every delta_t between 0 < t <= t_final
-        for i in range(1, size):
-            data[i] = ((i * delta_t, *analyticalSolution(*initialValues, i * delta_t), *numericalSolution(*initialValues, *previousValues)))
-            previousValues = data[i]
-
-        # Caluclate the maximum value and time of N_B analytically and numerically
-        analyticalMaxN_B = calculateAnalyticalMaxN_B(*initialValues)
-        numericalMaxN_B = calculateNumericalMaxN_B(data)
-
-        # Write the output file
-        writeOutput(outputFile, data, initialValues, analyticalMaxN_B, numericalMaxN_B)
-
-        # Make the reference graphs if asked for in the settings
-        if generate:
-            makeReferenceGraph(initialValues, data, 'image' + fileNum + '.png')
+from registry import openRegistry, allocateRun, recordRun, releaseRun, indexOutput, isReserved, findShorterRun
+from cache import getCacheKey, findCached, findComparison, useCached, storeCached, storeComparison
+from checkpoint import getCheckpointPath, loadCheckpoint, removeCheckpoint
+from compression import findFile
+from pipeline import solveLevel, getScheduleSteps
+from instrument import startInstruments, addLevel, getReport, getPeakRSS, getProfileSummary, measure
+from write import getOutputNumber, writeRunReport
+
+def main(run, generate, multiple, significance, options, renderer = None):
+    # Nothing is calculated unless main is run
+    if not run:
+        return []
+
+    # The plotting module and matplotlib are only loaded when graphs are asked for, since loading them takes longer than a run which only calculates
+    if generate:
+        from plotting import makeOutputGraph, drawReferenceGraph, getOutputData, getPixelWidth
+
+    # Open and read the input file for the first level
+    inputFile = open("input.txt", 'r')
+    initialValues = readInput(inputFile)
+
+    # The adaptive integrator keeps the error of each step within a hundredth of the significant difference
+    tolerance = significance * sum(initialValues[2:5]) / 100
+
+    # Open the registry of runs in the directory to number and record the output files
+    registry = openRegistry(directory)
+
+    # With Parallel Levels the next levels are solved at the same time in other processes before it is known whether they are needed
+    # A level only needs its own initial values and the previous level's, so levels can be solved in any order
+    executor = None
+    cancelled = None
+    if multiple and options['parallelLevels'] > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import Manager
+        executor = ProcessPoolExecutor(options['parallelLevels'])
+        cancelled = Manager().Event()
+
+    # Levels which have been started are kept in order with their number, initial values, cache key, whether they were cached, and their job
+    pending = deque()
+    renderJobs = []
+    nextValues = initialValues
+    previousValues = None
+    level = 0
+    while True:
+        # Start levels until as many as asked for are being solved, without going past the last level which could be needed
+        while len(pending) < max(1, options['parallelLevels']) and level + len(pending) <= (options['maxRefinements'] if multiple else 0):
+            # Use the output files of an earlier run with the same input values and integrator if they are cached
+            key = getCacheKey(nextValues, options['integrator'], tolerance, options['outputSchedule'], options['compression'])
+            cached = options['useCache'] and findCached(registry, directory, key, options['writeBinary'])
+            comparison = findComparison(registry, key, significance) if cached else None
+
+            # Number the output file to be written, using the number of an interrupted run of the level if it has a checkpoint to resume from
+            checkpointPath = getCheckpointPath(directory, key) if options['checkpointInterval'] > 0 else None
+            checkpoint = loadCheckpoint(checkpointPath) if not cached else None
+            if checkpoint != None and isReserved(registry, checkpoint['number']):
+                fileNum = checkpoint['number']
+            else:
+                fileNum = allocateRun(registry, directory)
+            if cached:
+                useCached(registry, directory, key, fileNum, options['writeBinary'])
+                steps = getScheduleSteps(options['outputSchedule'], nextValues)
+                indexOutput(registry, directory, fileNum, options['integrator'], None if steps is None else len(steps))
+
+            # Only solve the steps after the final time of a shorter run with the same values if asked for
+            # The adaptive integrator's steps depend on the final time, so its runs are solved again
+            extendFrom = None
+            if options['extendRuns'] and not cached and options['outputSchedule'] == None and options['integrator'] != 'adaptive':
+                extendFrom = findShorterRun(registry, nextValues, options['integrator'], options['writeBinary'], directory)
+
+            # Solve the level in another process or wait to solve it in this process when its result is needed
+            job = (directory, fileNum, nextValues, previousValues if len(pending) == 0 else pending[-1][1], options['integrator'], tolerance, significance, options['chunkSize'], options['writeBinary'], cached)
+            settings = (options['runReport'], options['traceMemory'], options['outputSchedule'], extendFrom, checkpointPath, options['checkpointInterval'], options['compression'], comparison)
+            if executor != None:
+                job = executor.submit(solveLevel, *job, cancelled, *settings)
+            else:
+                job = partial(solveLevel, *job, None, *settings)
+            pending.append((fileNum, nextValues, key, cached, job))
+
+            # Use the same initial values with half the time delta for the next level
+            nextValues = (*nextValues[:-2], nextValues[-2] / 2, nextValues[-1])
+
+        # Wait for the result of the coarsest level being solved
+        (fileNum, initialValues, key, cached, job) = pending.popleft()
+        (analyticalMaxN_B, numericalMaxN_B, dataOffset, changed, stages) = job() if executor == None else job.result()
+        addLevel(fileNum, initialValues, cached, stages)
 
-    # Repeat if there has only been one iteration or if there is a significant difference (0.05% of the total number of atoms, if 100 total atoms then 0.1 atoms) in any of the points.
-    # Also show the final plot or clear the plot to be repopulated in the next iteration.
-    # Don't repeat if multiple setting is False
-    if multiple and (previousData == None or checkRepeat(previousData, data, significance)):
+        # Record the run so that it can be found without opening the output file, and cache its output files
+        if not cached:
+            steps = getScheduleSteps(options['outputSchedule'], initialValues)
+            recordRun(registry, fileNum, initialValues, options['integrator'], analyticalMaxN_B, numericalMaxN_B, dataOffset, 'output' + fileNum + '.bin' if options['writeBinary'] else None,
+                rows = None if steps is None else len(steps))
+            # Output files with a summary of the stages of this run aren't cached, since the summary would be given to later runs which use them
+            if options['useCache'] and not options['runReport']:
+                storeCached(registry, directory, key, fileNum, options['writeBinary'], options['cacheSize'] * 2 ** 20)
+
+        # Record the comparison with the previous level with the cached files so that it isn't made again when they are used
+        if options['useCache'] and previousValues != None:
+            storeComparison(registry, key, significance, changed)
+
+        # Make the reference graphs if asked for in the settings, in the renderer's processes while the next levels are calculated if there is a renderer
+        # The graphs are drawn from the level's output file, so the level isn't solved again
         if generate:
-            clf()
-        main(run, generate, multiple, significance, initialValues = initialValues, previousData = data)
-    elif generate:
+            graph = (initialValues, findFile('output' + fileNum + '.txt'), 'image' + fileNum + '.png')
+            if renderer == None:
+                makeOutputGraph(*graph)
+            else:
+                renderJobs.append(renderer.submit(makeOutputGraph, *graph))
+
+        # Repeat if there has only been one iteration or if there is a significant difference (0.05% of the total number of atoms, if 100 total atoms then 0.1 atoms) in any of the points.
+        # Don't repeat if multiple setting is False or if the time delta has been halved the maximum number of times
+        if not multiple or level == options['maxRefinements'] or (previousValues != None and not changed):
+            break
+
+        # The next level is compared with this level
+        previousValues = initialValues
+        level += 1
+
+    # Cancel the finer levels which were started but aren't needed, removing their output files and records
+    if executor != None:
+        from concurrent.futures import wait
+        cancelled.set()
+        # The names of the final level's values aren't reused, since they are used to show its graph below
+        for (pendingNum, pendingValues, pendingKey, pendingCached, job) in pending:
+            job.cancel()
+            wait([job])
+            for path in [findFile('output' + pendingNum + '.txt'), 'output' + pendingNum + '.bin']:
+                if path != None and isfile(path):
+                    remove(path)
+            removeCheckpoint(getCheckpointPath(directory, pendingKey))
+            releaseRun(registry, pendingNum)
+        executor.shutdown()
+    registry.close()
+
+    # Show the reference graph of the final level if asked for, pyplot and its interactive backend are only loaded to show it
+    if generate and options['showGraph']:
+        from matplotlib.pyplot import show, gcf
+        drawReferenceGraph(gcf(), initialValues, getOutputData(findFile('output' + fileNum + '.txt'), getPixelWidth()))
         show()
 
-# Get the directory of main.py and make it the current working directory
-directory = dirname(abspath(getsourcefile(lambda:0)))
-chdir(directory)
+    # Return the jobs of the reference graphs which are being drawn by the renderer
+    return renderJobs
+
+# Levels may be solved in other processes which import main.py, so main is only run when main.py is run
+if __name__ == '__main__':
+    # Get the directory of main.py and make it the current working directory
+    directory = dirname(abspath(getsourcefile(lambda:0)))
+    chdir(directory)
+
+    # Read the settings file
+    (run, generate, multiple, significance, plot, *plotInfo, options) = readSettings(open('settings.txt'))
+
+    # Measure the stages of the run if asked for, profiling every function called in this process if asked for as well
+    startTime = perf_counter()
+    profiler = None
+    if options['runReport']:
+        startInstruments(options['traceMemory'])
+        if options['profile']:
+            from cProfile import Profile
+            profiler = Profile()
+            profiler.enable()
+
+    # Draw the graphs in a pool of processes if asked for in the settings
+    renderer = None
+    if options['renderWorkers'] > 0 and ((run and generate) or plot):
+        from concurrent.futures import ProcessPoolExecutor
+        renderer = ProcessPoolExecutor(options['renderWorkers'])
+
+    renderJobs = main(run, generate, multiple, significance, options, renderer)
+    if plot:
+        from plotting import makeFinalGraphs
+        renderJobs += makeFinalGraphs(*plotInfo, renderer = renderer)
+
+    # Wait for every graph to be saved, raising any error from drawing it
+    with measure('render wait'):
+        for job in renderJobs:
+            job.result()
+    if renderer != None:
+        renderer.shutdown()
 
-# Read the settings file
-(run, generate, multiple, significance, plot, *plotInfo) = readSettings(open('settings.txt'))
-main(run, generate, multiple, significance)
-if plot:
-    makeFinalGraphs(*plotInfo)
+    # Write the report of the run if asked for, along with the functions which took the most time if the run was profiled
+    if options['runReport']:
+        report = getReport()
+        report['seconds'] = perf_counter() - startTime
+        report['peakRSS'] = getPeakRSS()
+        reportNum = getOutputNumber(directory, 'report', '.json')
+        if profiler != None:
+            # The full profile is saved with the same number as the report to be opened with pstats or a profile viewer
+            profiler.disable()
+            profiler.dump_stats('profile' + reportNum + '.prof')
+            report['profile'] = getProfileSummary(profiler)
+        writeRunReport(open('report' + reportNum + '.json', 'w'), report)
 
 
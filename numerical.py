@@ -1,3 +1,6 @@
+from functools import lru_cache
+import numpy as np
+
 # Placeholders are used for unused data from unpacked tuples
 def numericalSolution(lambda_A, lambda_B, a, b, c, delta_t, d, e, f, g, h, N_A, N_B, N_C, i):
     # Calculate the amount of each decay and add or subtract it to the relevant counts
@@ -17,9 +20,186 @@ def numericalSolution(lambda_A, lambda_B, a, b, c, delta_t, d, e, f, g, h, N_A,
     N_C += N_Bdecay
     return (N_A, N_B, N_C, N_A + N_B + N_C)
 
-def calculateNumericalMaxN_B(data):
-    # Get the data point with max N_B
-    point = max(data, key = lambda p : p[5])
+# Each fixed step integrator applied to dN/dt = -lambda * N multiplies N by q = 1 - z * phi(z) every step, where z = lambda * delta_t
+# phi is given instead of q so that forward Euler, with phi = 1, keeps the same rounding as stepping
+stepFunctions = {
+    # Forward Euler, N(t + delta_t) = N(t) + delta_t * dN/dt(t)
+    'euler' : lambda z : 1.0,
+    # Classic fourth order Runge-Kutta, q is the Taylor series of exp(-z) to the fourth order
+    'rk4' : lambda z : 1 - z / 2 + z ** 2 / 6 - z ** 3 / 24,
+    # Backward Euler, N(t + delta_t) = N(t) + delta_t * dN/dt(t + delta_t), stable for any delta_t
+    'implicit' : lambda z : 1 / (1 + z),
+    # Exponential integrator, exact for each step of a linear chain, stable for any delta_t
+    'exponential' : lambda z : -np.expm1(-z) / z if z != 0 else 1.0,
+    }
+
+def exponentialMatrix(A):
+    # exp(A) for the step matrix A = delta_t * M of the chain, with the difference of the decays of A and B divided by the difference of their rates
+    # written with expm1 so that it stays exact when the rates are close or equal
+    (z_A, z_B) = (-A[0, 0], -A[1, 1])
+    E = np.zeros((3, 3))
+    (E[0, 0], E[1, 1], E[2, 2]) = (np.exp(-z_A), np.exp(-z_B), 1)
+    E[1, 0] = z_A * np.exp(-z_B) * (np.expm1(z_B - z_A) / (z_B - z_A) if z_B != z_A else 1.0)
+    E[2, 0] = -np.expm1(-z_A) - E[1, 0]
+    E[2, 1] = -np.expm1(-z_B)
+    return E
+
+# The same integrators as matrices applied to the counts every step, given A = delta_t * M where dN/dt = M N
+stepMatrices = {
+    'euler' : lambda A : np.eye(3) + A,
+    'rk4' : lambda A : np.eye(3) + A @ (np.eye(3) + A @ (np.eye(3) + A @ (np.eye(3) + A / 4) / 3) / 2),
+    'implicit' : lambda A : np.linalg.inv(np.eye(3) - A),
+    'exponential' : exponentialMatrix,
+    }
+
+# Rates of A and B whose step factors are closer than this fraction of the larger one are solved with matrix powers
+closeRates = 1e-3
+
+def matrixPowers(S, steps):
+    # Raise the matrix S to each power in steps by repeated squaring, multiplying in S ** (2 ** bit) for each bit which is set in the power
+    powers = np.broadcast_to(np.eye(3), (len(steps), 3, 3)).copy()
+    square = S
+    for bit in range(int(np.max(steps, initial = 0)).bit_length()):
+        bits = (steps >> bit) & 1 == 1
+        powers[bits] = powers[bits] @ square
+        square = square @ square
+    return powers
+
+# Calculate the numerical solution directly at any step index or array of step indices without stepping through the ones before it
+def numericalSolutions(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final, steps, integrator = 'euler', tolerance = None):
+    # The adaptive integrator chooses its own steps and is resampled at the times of the steps
+    if integrator == 'adaptive':
+        return resampleSolution(adaptiveSolution(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final, tolerance), np.asarray(steps) * delta_t)
+
+    # Each step multiplies the state by the same lower triangular matrix, for forward Euler
+    #     | 1 - lambda_A * delta_t            0                        0 |
+    #     |     lambda_A * delta_t  1 - lambda_B * delta_t             0 |
+    #     |                      0      lambda_B * delta_t             1 |
+    # so n steps have the same form as the analytical solution with exp(-lambda * t) replaced by r = q ** n
+    steps = np.asarray(steps)
+    phi_A = stepFunctions[integrator](lambda_A * delta_t)
+    phi_B = stepFunctions[integrator](lambda_B * delta_t)
+    d_A = lambda_A * delta_t * phi_A
+    d_B = lambda_B * delta_t * phi_B
+
+    # The closed form divides by the difference of the step factors q = 1 - d, so if they are close or equal, or if either step factor isn't positive,
+    # the matrix of one step is raised to the power of each step instead, which is exact for any rates
+    if min(d_A, d_B) < 0 or max(d_A, d_B) >= 1 or abs(d_B - d_A) <= closeRates * max(d_A, d_B):
+        A = delta_t * np.array([[-lambda_A, 0, 0], [lambda_A, -lambda_B, 0], [0, lambda_B, 0]])
+        N = matrixPowers(stepMatrices[integrator](A), np.atleast_1d(steps).astype(np.int64)) @ np.array([N_A0, N_B0, N_C0], dtype = np.float64)
+        (N_A, N_B, N_C) = (N[:, i].reshape(steps.shape)[()] for i in range(3))
+        return (N_A, N_B, N_C, N_A + N_B + N_C)
+
+    # r = q ** n and 1 - r are found from log(q) = log(1 - d) so that they keep their precision when d is small
+    L_A = np.log1p(-d_A)
+    L_B = np.log1p(-d_B)
+    r_A = np.exp(steps * L_A)
+    r_B = np.exp(steps * L_B)
+
+    # (r_A - r_B) / (lambda_B - lambda_A) is the larger r times the expm1 of n times the difference of the logs, which is found from d_B - d_A
+    # without subtracting the logs, so that it doesn't lose precision when the rates are close
+    differenceL = np.log1p(delta_t * (lambda_B * phi_B - lambda_A * phi_A) / (1 - d_B))
+    if differenceL >= 0:
+        D = -r_A * np.expm1(-steps * differenceL) / (lambda_B - lambda_A)
+    else:
+        D = r_B * np.expm1(steps * differenceL) / (lambda_B - lambda_A)
+
+    # The atoms which decayed out of A are in B or C, and those which decayed out of B are in C
+    N_A = N_A0 * r_A
+    N_B = N_B0 * r_B + (lambda_A * N_A0) * D
+    N_C = N_C0 - N_B0 * np.expm1(steps * L_B) - N_A0 * (np.expm1(steps * L_A) + lambda_A * D)
+    return (N_A, N_B, N_C, N_A + N_B + N_C)
+
+# Dormand-Prince coefficients for the fifth order solution, the fourth order error estimate, and the fourth order interpolation between steps
+dormandPrinceC = np.array([0, 1/5, 3/10, 4/5, 8/9, 1])
+dormandPrinceA = [[], [1/5], [3/40, 9/40], [44/45, -56/15, 32/9], [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]]
+dormandPrinceB = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])
+dormandPrinceE = np.array([-71/57600, 0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+dormandPrinceP = np.array([
+    [1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+    [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+    [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+    [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+    [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+
+# The adaptive integrator stops if it needs a step shorter than this fraction of t_final, which would barely move the time forward
+minimumStep = 1e-12
+
+# Integrate from 0 to t_final with the Dormand-Prince pair, choosing each step so that its error in any count is about the tolerance
+# The accepted steps are cached so that resampling any number of times only integrates once
+@lru_cache(maxsize = 8)
+def adaptiveSolution(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final, tolerance):
+    # The error of every step is measured against the tolerance, so no step could be accepted with a tolerance of 0
+    if tolerance == None or not tolerance > 0:
+        raise(Exception('The adaptive integrator needs a tolerance greater than 0 atoms, so the Percent of Total should be greater than 0'))
+
+    # dN/dt = M N
+    M = np.array([[-lambda_A, 0, 0], [lambda_A, -lambda_B, 0], [0, lambda_B, 0]])
+
+    # Start with a step small enough to resolve the faster decay, or the whole time if nothing decays
+    t = 0.0
+    N = np.array([N_A0, N_B0, N_C0], dtype = np.float64)
+    h = min(t_final, 0.01 / max(lambda_A, lambda_B)) if max(lambda_A, lambda_B) > 0 else t_final
+    K = np.empty((7, 3))
+    K[0] = M @ N
+
+    # Keep the time, counts, step, and interpolation polynomial of each accepted step
+    times = [t]
+    counts = [N]
+    steps = []
+    polynomials = []
+    while t < t_final:
+        if h < minimumStep * t_final:
+            raise(Exception('The adaptive integrator can\'t keep the error of a step within ' + str(tolerance) + ' atoms at t = ' + str(t) + ' s'))
+        h = min(h, t_final - t)
+
+        # Calculate the stages, the fifth order solution, and the error estimate
+        for i in range(1, 6):
+            K[i] = M @ (N + h * (dormandPrinceA[i] @ K[:i]))
+        newN = N + h * (dormandPrinceB @ K[:6])
+        K[6] = M @ newN
+        error = np.max(np.abs(h * (dormandPrinceE @ K))) / tolerance
+
+        # Accept the step if the error is within the tolerance
+        if error <= 1:
+            steps.append(h)
+            polynomials.append(K.T @ dormandPrinceP)
+            t = t + h if t + h < t_final else t_final
+            N = newN
+            K[0] = K[6]
+            times.append(t)
+            counts.append(N)
+
+        # Choose the next step from the error of this one
+        h *= min(5, max(0.2, 0.9 * (error + 1e-16) ** -0.2))
+
+    return (np.array(times), np.array(counts), np.array(steps), np.array(polynomials))
+
+# Interpolate an adaptive solution at each time in t
+def resampleSolution(solution, t):
+    times, counts, steps, polynomials = solution
+
+    # Find the accepted step containing each time and how far through the step the time is
+    t = np.asarray(t, dtype = np.float64)
+    i = np.clip(np.searchsorted(times, t, side = 'right') - 1, 0, len(steps) - 1)
+    x = (t - times[i]) / steps[i]
+
+    # N = N_i + h * (K^T P) [x, x^2, x^3, x^4]
+    N = counts[i] + steps[i][:, None] * np.einsum('nij,nj->ni', polynomials[i], np.stack((x, x ** 2, x ** 3, x ** 4), axis = 1))
+    return (N[:, 0], N[:, 1], N[:, 2], N[:, 0] + N[:, 1] + N[:, 2])
+
+def calculateNumericalMaxN_B(chunks, delta_t, start = 0):
+    # Keep the max N_B and its step index over consecutive chunks of data, the first of which starts at the step start
+    maxN_B = None
+    for data in chunks:
+        # Get the index of the data point with max N_B in this chunk, the first one is kept if there is a tie
+        i = int(np.argmax(data.N_Bn))
+        if maxN_B == None or data.N_Bn[i] > maxN_B:
+            (maxN_B, step) = (float(data.N_Bn[i]), start + i)
+        start += len(data)
 
-    # Return the time and N_B of this point
-    return (point[5], point[0])
+    # Return the time and N_B of this point, with the time as a multiple of delta_t as it is in the data
+    return (maxN_B, step * delta_t)
@@ -0,0 +1,205 @@
+from itertools import chain
+from os import remove
+from os.path import isfile, join
+from analytical import analyticalSolutions, calculateAnalyticalMaxN_B
+from numerical import numericalSolutions, calculateNumericalMaxN_B
+from check import checkRepeat
+from write import writeOutput, writeLevelReport
+from read import loadOutput
+from compression import compressionExtensions, openFile, isCompressed, findFile
+from cache import unshareFile
+from checkpoint import loadCheckpoint, saveCheckpoint, removeCheckpoint, makeMaxSaver, makeWriteSaver
+from instrument import measure, startInstruments, beginLevel, endLevel
+from dataset import emptyDataset
+import numpy as np
+
+
+# Calculate the rows of a level at the given step indices
+# The rows are returned as a dataset with the columns named in columnNames, the analytical columns are left empty if not asked for
+def solveChunk(initialValues, integrator, tolerance, steps, analytical = True):
+    delta_t = initialValues[-2]
+    data = emptyDataset(len(steps))
+    data.t[:] = steps * delta_t
+    if analytical:
+        (data.N_Aa[:], data.N_Ba[:], data.N_Ca[:]) = analyticalSolutions(*initialValues, data.t)
+    (data.N_An[:], data.N_Bn[:], data.N_Cn[:], data.N_total[:]) = numericalSolutions(*initialValues, steps, integrator, tolerance)
+    return data
+
+# Yield the rows of a level every delta_t between 0 <= t <= t_final in chunks of at most chunkSize rows, or only the rows at the given steps
+# The rows start at the row first and stop before the row last if given, so that part of a level can be solved
+# Only one chunk is held at a time so the memory used does not grow with the number of steps
+def levelChunks(initialValues, integrator, tolerance, chunkSize, analytical = True, steps = None, first = 0, last = None):
+    size = int(initialValues[-1] // initialValues[-2] + 1) if steps is None else len(steps)
+    if last != None:
+        size = min(size, last)
+    for start in range(first, size, chunkSize):
+        with measure('solve'):
+            chunkSteps = np.arange(start, min(start + chunkSize, size)) if steps is None else steps[start : start + chunkSize]
+            data = solveChunk(initialValues, integrator, tolerance, chunkSteps, analytical)
+        yield data
+
+# Get the steps of a level which are written to its output file, or None if every step is written
+# The schedule is None for every step, ("every", k) for every kth step and the last step, ("log", count) for count steps spaced evenly on a log scale from the first to the last step,
+# or ("times", times) for the steps closest to the times in seconds
+def getScheduleSteps(schedule, initialValues):
+    if schedule == None:
+        return None
+    lastStep = int(initialValues[-1] // initialValues[-2])
+    if schedule[0] == 'every':
+        return np.unique(np.append(np.arange(0, lastStep + 1, schedule[1]), lastStep))
+    if schedule[0] == 'log':
+        return np.unique(np.concatenate(([0], np.rint(np.geomspace(1, max(1, lastStep), max(1, schedule[1] - 1))).astype(np.int64))))
+    return np.unique(np.clip(np.rint(np.array(schedule[1]) / initialValues[-2]).astype(np.int64), 0, lastStep))
+
+# Yield each chunk of a level after comparing it with the previous level, which had twice the time delta
+# changed has True appended to it if any numerical count changes significantly from the previous level
+# The first chunk starts at the even step start
+def compareChunks(chunks, previousValues, integrator, tolerance, significance, changed, start = 0):
+    for data in chunks:
+        # Chunks start at even steps, so the previous level's points in this chunk are at half of the chunk's even steps
+        # The previous level is recalculated at these steps instead of being kept in memory
+        if not changed:
+            with measure('check'):
+                previousSteps = (start + np.arange(0, len(data), 2)) // 2
+                if checkRepeat(solveChunk(previousValues, integrator, tolerance, previousSteps, analytical = False), data, significance):
+                    changed.append(True)
+        start += len(data)
+        yield data
+
+# Yield each chunk until the level is cancelled
+def cancelChunks(chunks, cancelled):
+    for data in chunks:
+        if cancelled != None and cancelled.is_set():
+            return
+        yield data
+
+# Compare every step of a level with the previous level without keeping or writing any rows, stopping at the first significant change
+def compareLevel(initialValues, previousValues, integrator, tolerance, significance, chunkSize, changed, cancelled = None):
+    for data in compareChunks(cancelChunks(levelChunks(initialValues, integrator, tolerance, chunkSize, analytical = False), cancelled), previousValues, integrator, tolerance, significance, changed):
+        if changed:
+            return
+
+# Find the numerical max N_B and its time from the row first on, starting from the max N_B and its time found before that row if given
+# The rows are searched interval chunks at a time if an interval is given, and save is called with the rows searched and the max after each group to keep a checkpoint
+def findNumericalMaxN_B(initialValues, integrator, tolerance, chunkSize, first = 0, maxN_B = None, save = None, interval = 0):
+    size = int(initialValues[-1] // initialValues[-2] + 1)
+    group = chunkSize * interval if interval > 0 else size
+    for start in range(first, size, group):
+        found = calculateNumericalMaxN_B(levelChunks(initialValues, integrator, tolerance, chunkSize, analytical = False, first = start, last = start + group), initialValues[-2], start)
+
+        # The first max is kept if there is a tie, the same as within the chunks
+        if maxN_B == None or found[0] > maxN_B[0]:
+            maxN_B = found
+        if save != None and start + group < size:
+            save(start + group, maxN_B)
+    return maxN_B
+
+# Solve a level and write its output files, or only compare it with the previous level if its output files were linked from the cache
+# A cached level isn't compared again if the comparison recorded with its cached files is given
+# Levels may be solved in other processes so everything they need is given as arguments, and the registry and cache are left to main
+# If extendFrom is the output file of a shorter run with the same values, its rows are used instead of solving them again and only the rows after them are solved
+# With a checkpointInterval, the progress of the level is saved to checkpointPath every checkpointInterval chunks and an interrupted level is resumed from its last checkpoint
+# The output file is compressed as it is written with the compression if one is given, a compressed output file can't be continued so its rows are written again when it is resumed
+# Returns the analytical and numerical max N_B, where the data tables start in the output file, whether any count changed significantly from the previous level,
+# and the measured stages of the level if asked for with report, or None if the level was cancelled before it finished
+def solveLevel(directory, fileNum, initialValues, previousValues, integrator, tolerance, significance, chunkSize, writeBinary, cached = False, cancelled = None, report = False, traceMemory = False, schedule = None,
+        extendFrom = None, checkpointPath = None, checkpointInterval = 0, compression = 'none', comparison = None):
+    # Measure the stages of the level if asked for, which is started again here since the level may be solved in another process
+    if report:
+        startInstruments(traceMemory)
+    beginLevel(fileNum)
+    changed = []
+    if cached:
+        # Use the comparison with the previous level recorded with the cached files if there is one,
+        # otherwise only the numerical solution is needed to compare with the previous level
+        (analyticalMaxN_B, numericalMaxN_B, dataOffset) = (None, None, None)
+        if comparison:
+            changed.append(True)
+        elif previousValues != None and comparison == None:
+            compareLevel(initialValues, previousValues, integrator, tolerance, significance, chunkSize, changed, cancelled)
+
+    else:
+        # Resume from the last checkpoint of the level if it was interrupted, otherwise start a new checkpoint
+        checkpoint = loadCheckpoint(checkpointPath) if checkpointInterval > 0 else None
+        if checkpoint == None or checkpoint['number'] != fileNum or checkpoint['initialValues'] != list(initialValues) or checkpoint['binary'] != writeBinary:
+            checkpoint = {'number' : fileNum, 'initialValues' : list(initialValues), 'binary' : writeBinary, 'extendFrom' : extendFrom, 'phase' : 'max', 'rows' : 0, 'maxN_B' : None, 'changed' : False}
+        if checkpoint['changed']:
+            changed.append(True)
+
+        # Read the rows of the shorter run, which are memory mapped if it has a binary sidecar
+        # The rows after it are solved from an even step so that their chunks line up with the previous level's steps
+        extended = None
+        first = 0
+        if checkpoint['extendFrom'] != None:
+            (oldValues, oldAnalyticalMaxN_B, oldNumericalMaxN_B, extended) = loadOutput(join(directory, checkpoint['extendFrom']))
+            first = len(extended) - len(extended) % 2
+            if checkpoint['phase'] == 'max' and checkpoint['rows'] < first:
+                # The time of the max is read as a float, so it is made a multiple of delta_t again to be written the same way as in a new run
+                checkpoint.update({'rows' : first, 'maxN_B' : (oldNumericalMaxN_B[0], round(oldNumericalMaxN_B[1] / initialValues[-2]) * initialValues[-2])})
+
+        # Caluclate the maximum value and time of N_B analytically and numerically, the numerical maximum is found a chunk at a time before any data is written
+        analyticalMaxN_B = calculateAnalyticalMaxN_B(*initialValues)
+        if checkpoint['phase'] == 'max':
+            numericalMaxN_B = findNumericalMaxN_B(initialValues, integrator, tolerance, chunkSize, checkpoint['rows'], checkpoint['maxN_B'],
+                makeMaxSaver(checkpointPath, checkpoint) if checkpointInterval > 0 else None, checkpointInterval)
+            if cancelled != None and cancelled.is_set():
+                endLevel(fileNum)
+                return None
+            checkpoint.update({'phase' : 'write', 'rows' : 0, 'maxN_B' : numericalMaxN_B})
+            if checkpointInterval > 0:
+                saveCheckpoint(checkpointPath, checkpoint)
+        numericalMaxN_B = checkpoint['maxN_B']
+
+        path = join(directory, 'output' + fileNum)
+        textPath = path + '.txt' + compressionExtensions[compression]
+        start = checkpoint['rows']
+        if start > 0 and not isCompressed(textPath) and isfile(textPath) and (not writeBinary or isfile(path + '.bin')):
+            # Continue the output files after the rows written before the last checkpoint, removing anything written after it
+            outputFile = open(textPath, 'r+')
+            dataOffset = sum(len(outputFile.readline()) for lineNum in range(23))
+            outputFile.seek(checkpoint['textBytes'])
+            outputFile.truncate()
+            binaryFile = open(path + '.bin', 'r+b') if writeBinary else None
+        else:
+            # Open the output file and the binary sidecar if asked for, otherwise remove any old sidecar so that it isn't read in place of the new output file
+            start = 0
+            outputFile = openFile(textPath, 'w')
+            binaryFile = None
+            if writeBinary:
+                binaryFile = open(path + '.bin', 'wb')
+            elif isfile(path + '.bin'):
+                remove(path + '.bin')
+
+        # Calculate the analytical and numerical solutions every delta_t a chunk at a time, comparing each chunk with the previous level and writing it to the output file
+        # The rows of a shorter run are written first without solving them again
+        # If only some steps are written, every step is still compared with the previous level first, so the schedule doesn't change when the levels stop
+        steps = getScheduleSteps(schedule, initialValues)
+        chunks = levelChunks(initialValues, integrator, tolerance, chunkSize, steps = steps, first = max(start, first))
+        if start < first:
+            chunks = chain((extended[row : min(row + chunkSize, first)] for row in range(start, first, chunkSize)), chunks)
+        chunks = cancelChunks(chunks, cancelled)
+        if previousValues != None and steps is None:
+            chunks = compareChunks(chunks, previousValues, integrator, tolerance, significance, changed, start)
+        elif previousValues != None:
+            compareLevel(initialValues, previousValues, integrator, tolerance, significance, chunkSize, changed, cancelled)
+        written = writeOutput(outputFile, chunks, initialValues, analyticalMaxN_B, numericalMaxN_B, binaryFile, None if steps is None else len(steps), start,
+            makeWriteSaver(checkpointPath, checkpointInterval, checkpoint, changed) if checkpointInterval > 0 and not isCompressed(textPath) else None)
+        if start == 0:
+            dataOffset = written
+
+    stages = endLevel(fileNum)
+    if cancelled != None and cancelled.is_set():
+        return None
+
+    # The level is finished so it won't be resumed
+    if not cached:
+        removeCheckpoint(checkpointPath)
+
+    # Add a summary of the measured stages to the end of the output file
+    # An output file linked from the cache is copied first so that the summary isn't added to the cached file, and output files with a summary aren't cached
+    if report:
+        textPath = findFile(join(directory, 'output' + fileNum + '.txt'))
+        if cached:
+            unshareFile(textPath)
+        writeLevelReport(openFile(textPath, 'a'), stages)
+    return (analyticalMaxN_B, numericalMaxN_B, dataOffset, len(changed) > 0, stages)
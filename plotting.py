@@ -1,90 +1,183 @@
-from matplotlib.pyplot import plot, show, ylabel, xlabel, title, savefig, legend, clf
-from read import readOutput
+from os.path import getmtime
+from matplotlib import rcParams
+from matplotlib.figure import Figure
+from read import loadOutput
+from registry import openRegistry, findRun
+from dataset import Dataset, joinDatasets, columnNames
+from pipeline import levelChunks
+from compression import findFile
+from instrument import measure
+import numpy as np
 
 
 # Either input in command line after prompts with userInput = True or at the bottom of this file with userInput = False
 userInput = False
 
-def makeReferenceGraph(initialValues, data, path):
-    # Set a limit to the number of points graphed on the reference graphs
-    maxPoints = 400
-
-    # Pick points by dividing the indices of the data in increments of 1/399 times the total number of points and rounding so that the first and last points are included
-    numPoints = len(data)
-    if numPoints > maxPoints:
-        # numPoints - 1  is the largest index and maxPoints - 1 is the largest value in range(maxPoints)
-        data = [data[round(j * (numPoints - 1)/ (maxPoints - 1))] for j in range(maxPoints)]
-
-    # Get the data values as 8 lists instead of 1 list of tuples containing 8 elements each
-    # a denotes analytical and n denotes numerical
-    t, N_Aa, N_Ba, N_Ca, N_An, N_Bn, N_Cn, N_total = ([point[i] for point in data] for i in range(8))
-
-    # Plot and save the graph
-    plot(t, N_An, 'r', t, N_Aa, 'r--', t, N_Bn, 'g', t, N_Ba, 'g--', t, N_Cn, 'b', t, N_Ca, 'b--', t, N_total, 'black')
-    ylabel('N (atoms)')
-    xlabel('Time (s)')
-    title(r'$\Delta$ t = ' + str(initialValues[-2]) + ' s')
-    legend([r'$N_A$  (Numerical)', r'$N_A$  (Analytical)', r'$N_B$  (Numerical)', r'$N_B$  (Numerical)', r'$N_C$  (Analytical)', r'$N_C$  (Analytical)', r'$N_{Total}$ (Numerical)'])
-    savefig(path, format = 'png')
-
-def plotN_Bvs_t(path_coarse, path_medium, path_fine, imageName):
-    # Get the data from the 3 files
-    data_coarse = readOutput(open(path_coarse, 'r'))[3]
-    data_medium = readOutput(open(path_medium, 'r'))[3]
-    data_fine = readOutput(open(path_fine, 'r'))[3]
-
-    # Separate the data into lists
-    (Xcoarse, Ycoarse) = ([point[i] for point in data_coarse] for i in [0, 5])
-    (Xmedium, Ymedium) = ([point[i] for point in data_medium] for i in [0, 5])
-    (Xfine, Yanalytical, Yfine) = ([point[i] for point in data_fine] for i in [0, 2, 5])
-
-    # Plot and save the graph with high resolution
-    plot(Xcoarse, Ycoarse, 'g', Xmedium, Ymedium, 'b', Xfine, Yfine, 'r', Xfine, Yanalytical, 'black')
-    ylabel('N (atoms)')
-    xlabel('Time (s)')
-    title(r'$N_B$ vs t')
-    legend(['Coarse', 'Medium', 'Fine', 'Analytical'])
-    savefig(imageName, format = 'png', dpi = 1200)
-    clf()
-
-def plotNumerical(path_fine, imageName):
-    # Get the data from the file
-    data_fine = readOutput(open(path_fine, 'r'))[3]
-
-    # Split the data into relevant lists
-    (t, N_A, N_B, N_C, N_total) = ([point[i] for point in data_fine] for i in [0, 4, 5, 6, 7])
-
-    # Plot and save the graph with high resolution
-    plot(t, N_A, 'r', t, N_B, 'g', t, N_C, 'b', t, N_total, 'black')
-    ylabel('N (atoms)')
-    xlabel('Time (s)')
-    title('N vs t')
-    legend([r'$N_A$', r'$N_B$', r'$N_C$', r'$N_T$'])
-    savefig(imageName, format = 'png', dpi = 1200)
-    clf()
-
-def plotMaxN_BvsDelta_t(pathList, imageName):
+# Graphs are drawn on their own figures instead of the shared pyplot figure so that they can be drawn in other processes at the same time
+# A renderer is a pool of processes, or None to draw the graphs in this process
+
+def renderFigure(draw, path, dpi, *args):
+    # Draw a new figure with the draw function and the arguments, and save it as a png with the dpi or the figure's own dpi if None
+    with measure('render'):
+        figure = Figure()
+        draw(figure, *args)
+        figure.savefig(path, format = 'png', dpi = dpi)
+
+def submitFigure(renderer, draw, path, dpi, *args):
+    # Draw and save the figure in the renderer's processes, returning the job so that it can be waited for, or draw it now if there is no renderer
+    if renderer == None:
+        renderFigure(draw, path, dpi, *args)
+        return None
+    return renderer.submit(renderFigure, draw, path, dpi, *args)
+
+# Loaded columns of each output file are kept for the rest of the run so that files used by more than one graph are only read once
+# Each path is kept with the time its file was modified so that changed files are read again
+datasetCache = {}
+
+def getDataset(path, names):
+    # Read only the named columns which haven't been read from the file yet
+    modified = getmtime(path)
+    if path not in datasetCache or datasetCache[path][0] != modified:
+        datasetCache[path] = (modified, {})
+    columns = datasetCache[path][1]
+    missing = [name for name in names if name not in columns]
+    if len(missing) > 0:
+        with measure('load'):
+            data = loadOutput(path, columns = [columnNames.index(name) for name in missing])[3]
+        for name in missing:
+            columns[name] = data[name]
+    return Dataset([columns[name] for name in names], names)
+
+def getPixelWidth(dpi = None):
+    # Get the number of pixels across a new figure when it is saved with the given dpi, or the figure's own dpi
+    return int(rcParams['figure.figsize'][0] * (rcParams['figure.dpi'] if dpi == None else dpi))
+
+def getPlotIndices(columns, buckets, bucketSize = None):
+    # Split the rows into buckets of consecutive rows, about one bucket for each pixel across the graph unless the bucket size is given
+    numPoints = len(columns[0])
+    if bucketSize == None:
+        bucketSize = -(-numPoints // max(1, buckets))
+    if bucketSize <= 2:
+        return np.arange(numPoints)
+
+    # Keep the first and last row of each bucket and the rows with the min and max of each column so that peaks such as the max N_B are always drawn
+    # The last bucket is padded with its last row so that every bucket is the same size and the extremes of all buckets are found at once
+    count = -(-numPoints // bucketSize)
+    offsets = np.arange(count) * bucketSize
+    indices = [offsets, np.minimum(offsets + bucketSize - 1, numPoints - 1)]
+    for column in columns:
+        bucketValues = np.pad(np.asarray(column), (0, count * bucketSize - numPoints), mode = 'edge').reshape(count, bucketSize)
+        indices += [offsets + bucketValues.argmin(axis = 1), offsets + bucketValues.argmax(axis = 1)]
+    return np.unique(np.minimum(np.concatenate(indices), numPoints - 1))
+
+def downsample(data, names, buckets, bucketSize = None):
+    # Keep only the rows of the dataset needed to draw the named columns at the resolution of the graph
+    return data[getPlotIndices([data[name] for name in names], buckets, bucketSize)]
+
+def downsampleChunks(chunks, numPoints, names, buckets):
+    # Downsample a level given a chunk at a time with buckets of the same size in every chunk, so that the whole level is never held at once
+    bucketSize = -(-numPoints // max(1, buckets))
+    return joinDatasets(downsample(data, names, buckets, bucketSize) for data in chunks)
+
+def getReferenceData(initialValues, integrator, tolerance, chunkSize, buckets):
+    # Calculate a level a chunk at a time, only keeping the points which can be seen at the resolution of the graph
+    return downsampleChunks(levelChunks(initialValues, integrator, tolerance, chunkSize), int(initialValues[-1] // initialValues[-2] + 1), columnNames[1:], buckets)
+
+def getOutputData(path, buckets):
+    # Read a level which was already written from its binary sidecar or output file instead of solving it again, only keeping the points which can be seen at the resolution of the graph
+    # The rows are those which were written, so with an output schedule only the scheduled steps are drawn
+    with measure('load'):
+        data = loadOutput(path)[3]
+    return downsample(data, columnNames[1:], buckets)
+
+def drawReferenceGraph(figure, initialValues, data):
+    # Plot the graph using the columns of the dataset, a denotes analytical and n denotes numerical
+    axes = figure.gca()
+    t = data.t
+    axes.plot(t, data.N_An, 'r', t, data.N_Aa, 'r--', t, data.N_Bn, 'g', t, data.N_Ba, 'g--', t, data.N_Cn, 'b', t, data.N_Ca, 'b--', t, data.N_total, 'black')
+    axes.set_ylabel('N (atoms)')
+    axes.set_xlabel('Time (s)')
+    axes.set_title(r'$\Delta$ t = ' + str(initialValues[-2]) + ' s')
+    axes.legend([r'$N_A$  (Numerical)', r'$N_A$  (Analytical)', r'$N_B$  (Numerical)', r'$N_B$  (Numerical)', r'$N_C$  (Analytical)', r'$N_C$  (Analytical)', r'$N_{Total}$ (Numerical)'])
+
+def makeReferenceGraph(initialValues, integrator, tolerance, chunkSize, path):
+    # Calculate, draw, and save the reference graph of a level which isn't written to an output file
+    renderFigure(drawReferenceGraph, path, None, initialValues, getReferenceData(initialValues, integrator, tolerance, chunkSize, getPixelWidth()))
+
+def makeOutputGraph(initialValues, outputPath, path):
+    # Draw and save the reference graph of a level from its output file, which may be done in another process while the next levels are calculated
+    renderFigure(drawReferenceGraph, path, None, initialValues, getOutputData(outputPath, getPixelWidth()))
+
+def drawN_Bvs_t(figure, coarse, medium, fine):
+    # Plot the graph
+    axes = figure.gca()
+    axes.plot(coarse.t, coarse.N_Bn, 'g', medium.t, medium.N_Bn, 'b', fine.t, fine.N_Bn, 'r', fine.t, fine.N_Ba, 'black')
+    axes.set_ylabel('N (atoms)')
+    axes.set_xlabel('Time (s)')
+    axes.set_title(r'$N_B$ vs t')
+    axes.legend(['Coarse', 'Medium', 'Fine', 'Analytical'])
+
+def plotN_Bvs_t(path_coarse, path_medium, path_fine, imageName, renderer = None):
+    # Get only the times and N_B from the 3 files
+    # Only the points which can be seen at 1200 dpi are plotted
+    coarse = downsample(getDataset(path_coarse, ['t', 'N_Bn']), ['N_Bn'], getPixelWidth(1200))
+    medium = downsample(getDataset(path_medium, ['t', 'N_Bn']), ['N_Bn'], getPixelWidth(1200))
+    fine = downsample(getDataset(path_fine, ['t', 'N_Ba', 'N_Bn']), ['N_Ba', 'N_Bn'], getPixelWidth(1200))
+
+    # Draw and save the graph with high resolution
+    return submitFigure(renderer, drawN_Bvs_t, imageName, 1200, coarse, medium, fine)
+
+def drawNumerical(figure, data):
+    # Plot the graph
+    axes = figure.gca()
+    axes.plot(data.t, data.N_An, 'r', data.t, data.N_Bn, 'g', data.t, data.N_Cn, 'b', data.t, data.N_total, 'black')
+    axes.set_ylabel('N (atoms)')
+    axes.set_xlabel('Time (s)')
+    axes.set_title('N vs t')
+    axes.legend([r'$N_A$', r'$N_B$', r'$N_C$', r'$N_T$'])
+
+def plotNumerical(path_fine, imageName, renderer = None):
+    # Get only the times and numerical counts from the file
+    # Only the points which can be seen at 1200 dpi are plotted
+    data = getDataset(path_fine, ['t', 'N_An', 'N_Bn', 'N_Cn', 'N_total'])
+    data = downsample(data, data.names[1:], getPixelWidth(1200))
+
+    # Draw and save the graph with high resolution
+    return submitFigure(renderer, drawNumerical, imageName, 1200, data)
+
+def drawMaxN_BvsDelta_t(figure, x, y):
+    # Plot the graph
+    axes = figure.gca()
+    axes.plot(x, y)
+    axes.set_ylabel('Time (s)')
+    axes.set_xlabel(r'Inverse Time Delta ($s^{-1}$)')
+    axes.set_title(r'Time of $N_B$ max vs $\frac{1}{\Delta t}$')
+
+def plotMaxN_BvsDelta_t(pathList, imageName, renderer = None):
     # Make arrays to append to
     x = []
     y = []
 
-    # get the time delta and max time from each file
+    # get the time delta and max time of each file from the registry, only reading the files which aren't registered
+    registry = openRegistry('.')
     for path in pathList:
-        (inputValues, maxAnalyticalN_B, maxNumericalN_B, data) = readOutput(open(path), excludeData = True)
-        x.append(1 / inputValues[-2])
-        y.append(maxNumericalN_B[1])
-
-    # Plot and save the graph with high resolution
-    plot(x, y)
-    ylabel('Time (s)')
-    xlabel(r'Inverse Time Delta ($s^{-1}$)')
-    title(r'Time of $N_B$ max vs $\frac{1}{\Delta t}$')
-    savefig(imageName, format = 'png', dpi = 1200)
-    clf()
+        run = findRun(registry, path)
+        if run != None:
+            x.append(1 / run['delta_t'])
+            y.append(run['numericalMaxTime'])
+        else:
+            (inputValues, maxAnalyticalN_B, maxNumericalN_B, data) = loadOutput(path, excludeData = True)
+            x.append(1 / inputValues[-2])
+            y.append(maxNumericalN_B[1])
+    registry.close()
+
+    # Draw and save the graph with high resolution
+    return submitFigure(renderer, drawMaxN_BvsDelta_t, imageName, 1200, x, y)
 
 def makePathList(numList):
     if isinstance(numList, list):
-        return ['output' + num + '.txt' for num in numList]
+        # Use the compressed output file if the output file was compressed
+        return [findFile('output' + num + '.txt') or 'output' + num + '.txt' for num in numList]
     elif isinstance(numList, str):
         # Remove whitespace
         numList = ''.join(numList.split())
@@ -98,25 +191,28 @@ def makePathList(numList):
         # Split the list at the commas and send it back into the function as a list
         return makePathList(numList.split(','))
 
-def makeFinalGraphs(userInput, image1Name, image2Name, image3Name, coarseNum, mediumNum, fineNum, numList):
+def makeFinalGraphs(userInput, image1Name, image2Name, image3Name, coarseNum, mediumNum, fineNum, numList, renderer = None):
+    # Return the jobs of the graphs which are drawn by the renderer
+    jobs = []
     if userInput:
         # Ask the user for input to create and save the three required figures
-        plotN_Bvs_t(*makePathList([input('N_B vs t\nGive the number of the output file to be used as the coarse line: '),
+        jobs.append(plotN_Bvs_t(*makePathList([input('N_B vs t\nGive the number of the output file to be used as the coarse line: '),
             input('Give the number of the output file to be used as the medium line: '),
             input('Give the number of the output file to be used as the fine line: ')]),
-            input('Give the name that the image file should be saved as (excluding the extension): ') + '.png')
-        plotNumerical('output' + input('\nNumerical Solution\nGive the number of the output file to be used for the numerical solution: ') + '.txt',
-            input('Give the name that the image file should be saved as (excluding the extension): ') + '.png')
-        plotMaxN_BvsDelta_t(makePathList(input('\nmax N_B vs Delta t\nGive a list of output files to be used as a comma separated list of output file numbers: ')),
-            input('Give the name that the image file should be saved as (excluding the extension): ') + '.png')
+            input('Give the name that the image file should be saved as (excluding the extension): ') + '.png', renderer))
+        jobs.append(plotNumerical(makePathList([input('\nNumerical Solution\nGive the number of the output file to be used for the numerical solution: ')])[0],
+            input('Give the name that the image file should be saved as (excluding the extension): ') + '.png', renderer))
+        jobs.append(plotMaxN_BvsDelta_t(makePathList(input('\nmax N_B vs Delta t\nGive a list of output files to be used as a comma separated list of output file numbers: ')),
+            input('Give the name that the image file should be saved as (excluding the extension): ') + '.png', renderer))
 
     else:
         # Same except with the inputs used to generate the graphs included
-        plotN_Bvs_t(*makePathList([coarseNum,
+        jobs.append(plotN_Bvs_t(*makePathList([coarseNum,
             mediumNum,
             fineNum]),
-            image1Name + '.png')
-        plotNumerical('output' + fineNum + '.txt',
-            image2Name + '.png')
-        plotMaxN_BvsDelta_t(makePathList(numList),
-            image3Name + '.png')
+            image1Name + '.png', renderer))
+        jobs.append(plotNumerical(makePathList([fineNum])[0],
+            image2Name + '.png', renderer))
+        jobs.append(plotMaxN_BvsDelta_t(makePathList(numList),
+            image3Name + '.png', renderer))
+    return [job for job in jobs if job != None]
@@ -0,0 +1,54 @@
+import numpy as np
+from analytical import analyticalSolutions
+from numerical import numericalSolutions, adaptiveSolution, resampleSolution
+from read import loadOutput
+from dataset import Dataset, columnNames
+
+
+# Evaluate the analytical and numerical solutions at any times between 0 <= t <= t_final without solving every step before them
+# The analytical solution is exact at every time, the numerical solution only exists at the steps of the integrator,
+# so it is interpolated linearly between the steps before and after each time, or from the adaptive integrator's dense output
+# The tolerance is only used by the adaptive integrator and must be given for it
+# Returns a dataset with the columns named in columnNames
+def querySolution(initialValues, t, integrator = 'euler', tolerance = None):
+    delta_t = initialValues[-2]
+    t = np.atleast_1d(np.asarray(t, dtype = np.float64))
+    if np.any(t < 0) or np.any(t > initialValues[-1]):
+        raise(Exception('Expected times between 0 and t_final = ' + str(initialValues[-1]) + ' s'))
+
+    # The analytical solution doesn't depend on the time delta
+    (N_Aa, N_Ba, N_Ca) = analyticalSolutions(*initialValues, t)
+
+    if integrator == 'adaptive':
+        # The adaptive integrator's steps aren't at multiples of delta_t, its polynomial within each step is used instead
+        # Its steps depend on the tolerance, so there is no default one
+        if tolerance == None:
+            raise(Exception('The adaptive integrator needs a tolerance in atoms, main uses the Percent of Total times the total count / 100'))
+        numerical = resampleSolution(adaptiveSolution(*initialValues, tolerance), t)
+    else:
+        # Each step is calculated directly so only the steps on either side of each time are needed
+        lastStep = int(initialValues[-1] // delta_t)
+        before = np.minimum(np.floor(t / delta_t).astype(np.int64), lastStep)
+        after = np.minimum(before + 1, lastStep)
+        fraction = np.clip(t / delta_t - before, 0, 1)
+        lower = numericalSolutions(*initialValues, before, integrator, tolerance)
+        upper = numericalSolutions(*initialValues, after, integrator, tolerance)
+        numerical = [a + (b - a) * fraction for (a, b) in zip(lower, upper)]
+    return Dataset([t, N_Aa, N_Ba, N_Ca, *numerical])
+
+# Evaluate the columns of an output file at any times it covers, interpolated linearly between the rows before and after each time
+# The binary sidecar is used if there is one, so only the pages of the rows around the times are read from the disk
+def queryOutput(path, t, names = columnNames[1:]):
+    (inputValues, maxAnalyticalN_B, maxNumericalN_B, data) = loadOutput(path, columns = [columnNames.index(name) for name in ('t', *names)])
+    t = np.atleast_1d(np.asarray(t, dtype = np.float64))
+    if len(data) == 0 or np.any(t < data.t[0]) or np.any(t > data.t[-1]):
+        raise(Exception('Expected times between ' + str(data.t[0] if len(data) > 0 else 0) + ' and ' + str(data.t[-1] if len(data) > 0 else 0) + ' s in ' + path))
+
+    # Find the rows on either side of each time, which works for output files with only some steps written as well
+    after = np.clip(np.searchsorted(data.t, t, side = 'left'), 1, max(1, len(data) - 1))
+    before = after - 1
+    if len(data) == 1:
+        after = before = np.zeros(len(t), dtype = np.int64)
+    span = data.t[after] - data.t[before]
+    fraction = np.divide(t - data.t[before], span, out = np.zeros(len(t)), where = span > 0)
+    return Dataset([t] + [data[name][before] + (data[name][after] - data[name][before]) * fraction for name in names], ('t', *names))
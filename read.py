@@ -1,10 +1,17 @@
 from math import log
+from os.path import isfile
+from struct import unpack, calcsize
+from write import binaryHeaderFormat, binaryHeaderSize, binaryMagic
+from dataset import Dataset, emptyDataset, columnNames
+from compression import openFile, removeCompression, compressionExtensions
+import numpy as np
 
 
 # Define units and unit conversions to 1 second and 1 atom
 ratioUnits = ['', '%']
 timeUnits = ['s', 'm', 'h', 'd', 'y']
 countUnits = ['', 'mol']
+integrators = ['euler', 'rk4', 'implicit', 'exponential', 'adaptive']
 convert = {'s' : 1, 'm' : 60, 'h' : 3600, 'd' : 86400, 'y' : 31557600, 'mol' : 6.0221408E23, '' : 1, '%' : 0.01 }
 
 # Define a default error message to precede any error message
@@ -54,28 +61,31 @@ def getArgList(line):
 
 
 def getLambda(line, lineNum, s):
-    # Extract the arguments from the line
-    argList = getArgList(line)
+    # Extract the arguments from the line and convert them to a decay constant
+    return getRate(getArgList(line), 1, lineNum, s)
 
+
+def getRate(argList, argNum, lineNum, s):
+    # argNum is the argument number of the first element of argList in the line for error messages
     # Determine which decay rate is given and convert to a decay constant in seconds inverse
     if argList[0] == "half-life":
-        checkFloat(argList[1], 2, lineNum, s)
-        checkUnits(argList[2], 3, lineNum, s, timeUnits)
+        checkFloat(argList[1], argNum + 1, lineNum, s)
+        checkUnits(argList[2], argNum + 2, lineNum, s, timeUnits)
         return log(2) / float(argList[1]) / convert[argList[2]]
 
     elif argList[0] == "decayconstant":
-        checkFloat(argList[1], 2, lineNum, s)
-        checkUnits(argList[2], 3, lineNum, s, timeUnits)
-        return float(argList[1]) / argList[2]
+        checkFloat(argList[1], argNum + 1, lineNum, s)
+        checkUnits(argList[2], argNum + 2, lineNum, s, timeUnits)
+        return float(argList[1]) / convert[argList[2]]
 
     elif argList[0] == "meanlifetime":
-        checkFloat(argList[1], 2, lineNum, s)
-        checkUnits(argList[2], 3, lineNum, s, timeUnits)
+        checkFloat(argList[1], argNum + 1, lineNum, s)
+        checkUnits(argList[2], argNum + 2, lineNum, s, timeUnits)
         return 1 / float(argList[1]) / convert[argList[2]]
 
     # If none of these values are specified, raise an error
     else:
-        raise(Exception(errorMessage.format(lineNum, s) + ' expected "half-life", "decay constant", or "mean lifetime" as the first argument'))
+        raise(Exception(errorMessage.format(lineNum, s) + ' expected "half-life", "decay constant", or "mean lifetime" as argument number ' + str(argNum)))
 
 
 def getCount(line, lineNum, s):
@@ -211,13 +221,36 @@ def readInput(inputFile):
 
     return (lambda_A, lambda_B, N_A0, N_B0, N_C0, Delta_t, t_final)
 
-def readOutput(outputFile, excludeData = False):
-    # Iterate over all of the lines in the file and retrieve relevant data
-    lineNum = 0
-    data = []
+# Number of rows of the data tables which are read and converted at a time
+readBlockRows = 65536
+
+def getColumnSpans(timeSize):
+    # Get the first and last + 1 character of each column in a row of the data tables
+    # The time is followed by 5 spaces, the 3 analytical counts separated by "|", 5 spaces, and the 4 numerical counts separated by "|"
+    return ([(0, timeSize)] +
+        [(timeSize + 5 + 15 * j, timeSize + 19 + 15 * j) for j in range(3)] +
+        [(timeSize + 54 + 15 * j, timeSize + 68 + 15 * j) for j in range(4)])
+
+def parseRows(block, spans, columns):
+    # Each row is as wide as the last column plus the new line
+    rows = block.encode()
+    width = spans[-1][1] + 1
+
+    # If every row has the same width, view each column of all of the rows as fixed width strings without copying and convert them to floats at once
+    if len(rows) % width == 0 and rows[width - 1 :: width] == b'\n' * (len(rows) // width):
+        return [np.ndarray((len(rows) // width,), 'S' + str(spans[j][1] - spans[j][0]), rows, spans[j][0], (width,)).astype(np.float64) for j in columns]
+
+    # Otherwise a value is wider than its column, so split the rows at the spaces and "|" separators instead
+    values = np.array(block.replace('|', ' ').split(), dtype = np.float64).reshape(-1, 8)
+    return [values[:, j] for j in columns]
+
+# Read the header of an output file and the columns of the data tables with the given indices
+# The data is returned as a dataset of the columns asked for, in the order asked for
+def readOutput(outputFile, excludeData = False, columns = range(8)):
+    # Iterate over the lines of the header and retrieve relevant data
     inputValues = []
-    for line in outputFile:
-        lineNum += 1
+    for lineNum in range(1, 24):
+        line = outputFile.readline()
 
         # Get the input values
         if 3 < lineNum < 11:
@@ -240,30 +273,212 @@ def readOutput(outputFile, excludeData = False):
             maxNumericalN_B[0] = float(maxNumericalN_B[0].split(' : ')[1])
             maxNumericalN_B[1] = float(maxNumericalN_B[1].split(' s')[0])
             if excludeData:
-                break
+                return (inputValues, maxAnalyticalN_B, maxNumericalN_B, emptyDataset(0, [columnNames[i] for i in columns]))
 
         # Get the size of the columns
         if lineNum == 23:
             # Split the line by the column table separator
             timeSize = len(line[:-1].split('     ')[0])
-            countSize = 14
-            separatorSize = 5
-
-        if lineNum >= 24:
-            # Get each data point from the tables
-            t = float(line[:timeSize])
-            N_Aa = float(line[timeSize + separatorSize : timeSize + separatorSize + countSize])
-            N_Ba = float(line[timeSize + separatorSize + countSize + 1 : timeSize + separatorSize + 2 * countSize + 1])
-            N_Ca = float(line[timeSize + separatorSize + 2 * countSize + 2 : timeSize + separatorSize + 3 * countSize + 2])
-            N_An = float(line[timeSize + 2 * separatorSize + 3 * countSize + 2 : timeSize + 2 * separatorSize + 4 * countSize + 2])
-            N_Bn = float(line[timeSize + 2 * separatorSize + 4 * countSize + 3 : timeSize + 2 * separatorSize + 5 * countSize + 3])
-            N_Cn = float(line[timeSize + 2 * separatorSize + 5 * countSize + 4 : timeSize + 2 * separatorSize + 6 * countSize + 4])
-            N_Total = float(line[timeSize + 2 * separatorSize + 6 * countSize + 5 : timeSize + 2 * separatorSize + 7 * countSize + 5])
-
-            # Append it to the list of data points as a tuple
-            data.append((t, N_Aa, N_Ba, N_Ca, N_An, N_Bn, N_Cn, N_Total))
+            spans = getColumnSpans(timeSize)
+
+    # Read the data tables a block of rows at a time, finishing the last row of each block if it was cut off
+    blocks = []
+    width = spans[-1][1] + 1
+    while True:
+        block = outputFile.read(readBlockRows * width)
+        if block == '' or block[0] == '\n':
+            break
+        if block[-1] != '\n':
+            block += outputFile.readline()
+
+        # The data tables end at a blank line, which is followed by the run report if there is one
+        end = block.find('\n\n')
+        if end >= 0:
+            blocks.append(parseRows(block[:end + 1], spans, columns))
+            break
+        blocks.append(parseRows(block, spans, columns))
+
+    # Put the blocks of each column together
+    data = emptyDataset(sum(len(block[0]) for block in blocks), [columnNames[i] for i in columns])
+    start = 0
+    for block in blocks:
+        for column, values in zip(data.columns, block):
+            column[start : start + len(values)] = values
+        start += len(block[0])
     return (inputValues, maxAnalyticalN_B, maxNumericalN_B, data)
 
+def readBinary(path):
+    # Read the header of the binary sidecar
+    binaryFile = open(path, 'rb')
+    (magic, version, columns, rows, *values) = unpack(binaryHeaderFormat, binaryFile.read(calcsize(binaryHeaderFormat)))
+    binaryFile.close()
+    if magic != binaryMagic or version != 1:
+        raise(Exception(path + ' is not a binary output file'))
+
+    # Map the columns into memory without reading them, only the pages of the columns and rows which are used are read from the disk
+    # Each column of the dataset is a view of the memory map
+    data = np.memmap(path, dtype = '<f8', mode = 'r', offset = binaryHeaderSize, shape = (columns, rows))
+    return (values[:7], values[7:9], values[9:11], Dataset(list(data)))
+
+def loadOutput(path, excludeData = False, columns = range(8)):
+    # Use the binary sidecar of an output file if there is one, otherwise read the output file, which is decompressed as it is read if it is compressed
+    binaryPath = removeCompression(path)[:-4] + '.bin'
+    if isfile(binaryPath):
+        (inputValues, maxAnalyticalN_B, maxNumericalN_B, data) = readBinary(binaryPath)
+
+        # Each column is a view of the memory map so nothing is copied
+        return (inputValues, maxAnalyticalN_B, maxNumericalN_B, data.select([columnNames[i] for i in columns]))
+    return readOutput(openFile(path, 'r'), excludeData, columns)
+
+def readChain(chainFile):
+    # Define a variable to use in error messages
+    s = 'chain'
+
+    # Define variables to keep track of the members, branches, and the line of the file
+    names = []
+    lambdas = []
+    counts = []
+    branches = []
+    Delta_t = None
+    t_final = None
+    lineNum = 0
+
+    # Gather the chain definition from the chain file
+    for line in chainFile:
+        lineNum += 1
+
+        # Remove whitespace but keep the case of the member names
+        line = ''.join(line.split())
+
+        # Ignore commented and empty lines
+        if line != '' and line[0] != '#':
+            name = line.split('=')[0].lower()
+
+            # Each member has a name, a decay rate or "stable", and an initial count
+            if name == 'member':
+                expect(line, "Member =", 'many', lineNum, s)
+                argList = getArgList(line)
+                argList[1:-2] = [arg.lower() for arg in argList[1:-2]]
+                argList[-1] = argList[-1].lower()
+                if len(argList) == 4 and argList[1] == 'stable':
+                    lambdas.append(0.0)
+                elif len(argList) == 6:
+                    lambdas.append(getRate(argList[1:4], 2, lineNum, s))
+                else:
+                    raise(Exception(errorMessage.format(lineNum, s) + ' expected a name, a decay rate or "stable", and an initial count'))
+                checkFloat(argList[-2], len(argList) - 1, lineNum, s)
+                checkUnits(argList[-1], len(argList), lineNum, s, countUnits)
+                if argList[0] in names:
+                    raise(Exception(errorMessage.format(lineNum, s) + ' member ' + argList[0] + ' is already defined'))
+                names.append(argList[0])
+                counts.append(float(argList[-2]) * convert[argList[-1]])
+
+            # Each branch has a parent, a daughter, and the fraction of the parent's decays which produce the daughter
+            elif name == 'branch':
+                expect(line, "Branch =", 3, lineNum, s)
+                parent, daughter, ratio = getArgList(line)
+                for member in (parent, daughter):
+                    if member not in names:
+                        raise(Exception(errorMessage.format(lineNum, s) + ' member ' + member + ' must be defined before it is used in a branch'))
+                checkFloat(ratio, 3, lineNum, s)
+                branches.append((names.index(parent), names.index(daughter), float(ratio)))
+
+            elif name == 'timedelta':
+                expect(line.lower(), "Time Delta =", 2, lineNum, s)
+                Delta_t = getTime(line.lower(), lineNum, s)
+
+            elif name == 'finaltime':
+                expect(line.lower(), "Final Time =", 2, lineNum, s)
+                t_final = getTime(line.lower(), lineNum, s)
+
+            else:
+                raise(Exception(errorMessage.format(lineNum, s) + ' expected "Member", "Branch", "Time Delta", or "Final Time"'))
+
+    if len(names) == 0 or Delta_t == None or t_final == None:
+        raise(Exception('Error in chain.txt, at least one member, the time delta, and the final time must be given'))
+
+    return (names, lambdas, counts, branches, Delta_t, t_final)
+
+def getInteger(line, lineNum, s):
+    # Return the number as an integer
+    return int(getNum(line, lineNum, s))
+
+def getChunkSize(line, lineNum, s):
+    # Return the number as an even integer of at least 2 so that every chunk starts at an even step
+    number = getInteger(line, lineNum, s)
+    return max(2, number + number % 2)
+
+def getIntegrator(line, lineNum, s):
+    # Extracts the arguments from the line
+    argList = getArgList(line)
+
+    # Check that the integrator is one of the known integrators
+    if argList[0] not in integrators:
+        raise(Exception(errorMessage.format(lineNum, s) + ' expected an integrator in ' + ', '.join(integrators)))
+    return argList[0]
+
+def getSchedule(line, lineNum, s):
+    # Extracts the arguments from the line
+    argList = getArgList(line)
+
+    # The schedule is "All" for every step, "Every, k" for every kth step, "Log, count" for count steps spaced evenly on a log scale,
+    # or "Times, t1; t2; ..., unit" for the steps closest to the given times
+    if argList[0] == 'all' and len(argList) == 1:
+        return None
+    if argList[0] in ['every', 'log'] and len(argList) == 2:
+        checkDigits(argList[1], lineNum, s)
+        if int(argList[1]) < 1:
+            raise(Exception(errorMessage.format(lineNum, s) + ' expected a count of at least 1'))
+        return (argList[0], int(argList[1]))
+    if argList[0] == 'times' and len(argList) == 3:
+        checkUnits(argList[2], 3, lineNum, s, timeUnits)
+        times = []
+        for time in argList[1].split(';'):
+            checkFloat(time, 2, lineNum, s)
+            times.append(float(time) * convert[argList[2]])
+        return ('times', tuple(times))
+    raise(Exception(errorMessage.format(lineNum, s) + ' expected "All", "Every, k", "Log, count", or "Times, t1; t2; ..., unit"'))
+
+def getCompression(line, lineNum, s):
+    # Extracts the arguments from the line
+    argList = getArgList(line)
+
+    # Check that the compression is one of the known compressions
+    if argList[0] not in compressionExtensions:
+        raise(Exception(errorMessage.format(lineNum, s) + ' expected a compression in ' + ', '.join(compressionExtensions)))
+    return argList[0]
+
+# Settings which may be given in any order after the required settings
+# Each is given with the setting as it appears in the file, the name it is returned as, the number of arguments, the function to read it, and its default value
+optionalSettings = [
+    ("Max Refinements =", 'maxRefinements', 1, getInteger, 20),
+    ("Integrator =", 'integrator', 1, getIntegrator, 'euler'),
+    ("Chunk Size =", 'chunkSize', 1, getChunkSize, 65536),
+    ("Write Binary =", 'writeBinary', 1, getTruth, False),
+    ("Use Cache =", 'useCache', 1, getTruth, False),
+    ("Cache Size =", 'cacheSize', 1, getInteger, 1024),
+    ("Parallel Levels =", 'parallelLevels', 1, getInteger, 1),
+    ("Render Workers =", 'renderWorkers', 1, getInteger, 0),
+    ("Show Graph =", 'showGraph', 1, getTruth, True),
+    ("Run Report =", 'runReport', 1, getTruth, False),
+    ("Trace Memory =", 'traceMemory', 1, getTruth, False),
+    ("Profile =", 'profile', 1, getTruth, False),
+    ("Output Schedule =", 'outputSchedule', 'many', getSchedule, None),
+    ("Checkpoint Interval =", 'checkpointInterval', 1, getInteger, 0),
+    ("Extend Runs =", 'extendRuns', 1, getTruth, False),
+    ("Compression =", 'compression', 1, getCompression, 'none'),
+    ("Convergence Levels =", 'convergenceLevels', 1, getInteger, 4),
+    ]
+
+def getOptional(line, lineNum, s, settingList, options):
+    # Find the optional setting with the name given before the "=" and put its value in options
+    for (expected, name, argNum, getValue, default) in settingList:
+        if line.split('=')[0] == ''.join(expected.split()).lower()[:-1]:
+            expect(line, expected, argNum, lineNum, s)
+            options[name] = getValue(line, lineNum, s)
+            return
+    raise(Exception(errorMessage.format(lineNum, s) + ' expected one of the optional settings ' + ', '.join('"' + setting[0][:-2] + '"' for setting in settingList)))
+
 # Use readInput as a template for readSettings
 def readSettings(settingsFile):
     # Define a string to use in error messages
@@ -273,6 +488,9 @@ def readSettings(settingsFile):
     datumNum = 0
     lineNum = 0
 
+    # Start the optional settings at their default values
+    options = {name : default for (expected, name, argNum, getValue, default) in optionalSettings}
+
     # Gather input data from the input file
     for line in settingsFile:
         lineNum += 1
@@ -339,5 +557,214 @@ def readSettings(settingsFile):
                 expect(line, "Data Numbers =", 'many', lineNum, s)
                 numList = getList(line, lineNum, s)
                 datumNum += 1
+            else:
+                getOptional(line, lineNum, s, optionalSettings, options)
+
+    return (run, generate, multiple, significance, plot, userInput, image1Name, image2Name, image3Name, coarseNum, mediumNum, fineNum, numList, options)
+
+def getSweepLines(line, argNum, lineNum, s):
+    # The value at argNum may be a single value, a list of values separated by semicolons, or a range "start : stop : count" of evenly spaced values
+    argList = getArgList(line)
+    values = []
+    for value in argList[argNum - 1].split(';'):
+        if value.count(':') == 2:
+            (start, stop, count) = value.split(':')
+            checkFloat(start, argNum, lineNum, s)
+            checkFloat(stop, argNum, lineNum, s)
+            checkDigits(count, lineNum, s)
+            values += [repr(float(el)) for el in np.linspace(float(start), float(stop), int(count))]
+        else:
+            values.append(value)
+
+    # Return a line for each value so that it is read the same way as the line in input.txt
+    return [line.split('=')[0] + '=' + ','.join(argList[:argNum - 1] + [value] + argList[argNum:]) for value in values]
+
+# Settings of a sweep which may be given in any order after the swept values
+sweepSettings = [
+    ("Workers =", 'workers', 1, getInteger, 0),
+    ("Batch Size =", 'batchSize', 1, getInteger, 16),
+    ("Write Outputs =", 'writeOutputs', 1, getTruth, False),
+    ]
+
+# Use readInput as a template for readSweep
+def readSweep(sweepFile):
+    # Define a variable to use in error messages
+    s = 'sweep'
+
+    # Define variables to keep track of the expected datum and the line of the file
+    datumNum = 0
+    lineNum = 0
+
+    # Start the sweep settings at their default values
+    options = {name : default for (expected, name, argNum, getValue, default) in sweepSettings}
+
+    # Gather the list of values for each input from the sweep file
+    for line in sweepFile:
+        lineNum += 1
+
+        # Remove whitespace and make all letters lowercase
+        line = ''.join(line.split()).lower()
+
+        # Ignore commented and empty lines
+        if line != '' and line[0] != '#':
+
+            # Verify that the line is the expected line and formatting and get the values if so
+            if datumNum == 0:
+                expect(line, "Decay Rate A =", 3, lineNum, s)
+                lambda_A = [getLambda(el, lineNum, s) for el in getSweepLines(line, 2, lineNum, s)]
+                datumNum += 1
+            elif datumNum == 1:
+                expect(line, "Decay Rate B =", 3, lineNum, s)
+                lambda_B = [getLambda(el, lineNum, s) for el in getSweepLines(line, 2, lineNum, s)]
+                datumNum += 1
+            elif datumNum == 2:
+                expect(line, "Initial Count A =", 2, lineNum, s)
+                N_A0 = [getCount(el, lineNum, s) for el in getSweepLines(line, 1, lineNum, s)]
+                datumNum += 1
+            elif datumNum == 3:
+                expect(line, "Initial Count B =", 2, lineNum, s)
+                N_B0 = [getCount(el, lineNum, s) for el in getSweepLines(line, 1, lineNum, s)]
+                datumNum += 1
+            elif datumNum == 4:
+                expect(line, "Initial Count C =", 2, lineNum, s)
+                N_C0 = [getCount(el, lineNum, s) for el in getSweepLines(line, 1, lineNum, s)]
+                datumNum += 1
+            elif datumNum == 5:
+                expect(line, "Time Delta =", 2, lineNum, s)
+                Delta_t = [getTime(el, lineNum, s) for el in getSweepLines(line, 1, lineNum, s)]
+                datumNum += 1
+            elif datumNum == 6:
+                expect(line, "Final Time =", 2, lineNum, s)
+                t_final = [getTime(el, lineNum, s) for el in getSweepLines(line, 1, lineNum, s)]
+                datumNum += 1
+            else:
+                getOptional(line, lineNum, s, sweepSettings, options)
+
+    if datumNum < 7:
+        raise(Exception('Error in sweep.txt, every input in input.txt must be given'))
+
+    return (lambda_A, lambda_B, N_A0, N_B0, N_C0, Delta_t, t_final, options)
+
+# Stages which are benchmarked by bench.py
+benchStages = ['startup', 'analytical', 'numerical', 'write', 'read', 'check', 'plot']
+
+def getStages(line, lineNum, s):
+    # Extracts the arguments from the line
+    argList = getArgList(line)
+
+    # Check that each stage is one of the stages which can be benchmarked
+    for stage in argList:
+        if stage not in benchStages:
+            raise(Exception(errorMessage.format(lineNum, s) + ' expected stages in ' + ', '.join(benchStages)))
+    return argList
+
+# Settings of the benchmarks, which may all be given in any order
+benchSettings = [
+    ("Min Power =", 'minPower', 1, getInteger, 0),
+    ("Max Power =", 'maxPower', 1, getInteger, 20),
+    ("Repeats =", 'repeats', 1, getInteger, 3),
+    ("Plot Repeats =", 'plotRepeats', 1, getInteger, 1),
+    ("Stages =", 'stages', 'many', getStages, benchStages),
+    ("Baseline =", 'baseline', 1, getFileName, 'benchBaseline.json'),
+    ("Save Baseline =", 'saveBaseline', 1, getTruth, False),
+    ("Regression =", 'regression', 2, getRatio, 0.25),
+    ("Startup Budget =", 'startupBudget', 2, getTime, 0.5),
+    ]
+
+# Use readSettings as a template for readBench
+def readBench(benchFile):
+    # Define a variable to use in error messages
+    s = 'bench'
+    lineNum = 0
+
+    # Start the settings at their default values
+    options = {name : default for (expected, name, argNum, getValue, default) in benchSettings}
+
+    for line in benchFile:
+        lineNum += 1
+
+        # Remove whitespace and make all letters lowercase if not looking for a file name
+        line = ''.join(line.split())
+        if line.lower()[:9] != 'baseline=':
+            line = line.lower()
+
+        # Ignore commented and empty lines
+        if line != '' and line[0] != '#':
+            getOptional(line[:line.find('=')].lower() + line[line.find('='):], lineNum, s, benchSettings, options)
+
+    return options
+
+def getPercentiles(line, lineNum, s):
+    # Extracts the arguments from the line
+    argList = getArgList(line)
+
+    # Check that each percentile is a number from 0 to 100
+    percentiles = []
+    for argNum, el in enumerate(argList, 1):
+        checkFloat(el, argNum, lineNum, s)
+        if not 0 <= float(el) <= 100:
+            raise(Exception(errorMessage.format(lineNum, s) + ' expected percentiles from 0 to 100'))
+        percentiles.append(float(el))
+    return percentiles
+
+# Settings of a stochastic ensemble, which may all be given in any order
+ensembleSettings = [
+    ("Realizations =", 'realizations', 1, getInteger, 10000),
+    ("Batch Size =", 'batchSize', 1, getInteger, 1000),
+    ("Workers =", 'workers', 1, getInteger, 0),
+    ("Seed =", 'seed', 1, getInteger, 0),
+    ("Percentiles =", 'percentiles', 'many', getPercentiles, [5.0, 50.0, 95.0]),
+    ("Bins =", 'bins', 1, getInteger, 1024),
+    ]
+
+# Use readBench as a template for readEnsemble
+def readEnsemble(ensembleFile):
+    # Define a variable to use in error messages
+    s = 'ensemble'
+    lineNum = 0
+
+    # Start the settings at their default values
+    options = {name : default for (expected, name, argNum, getValue, default) in ensembleSettings}
+
+    for line in ensembleFile:
+        lineNum += 1
+
+        # Remove whitespace and make all letters lowercase
+        line = ''.join(line.split()).lower()
+
+        # Ignore commented and empty lines
+        if line != '' and line[0] != '#':
+            getOptional(line, lineNum, s, ensembleSettings, options)
+
+    if options['realizations'] < 1 or options['batchSize'] < 1 or options['bins'] < 1:
+        raise(Exception('Error in ensemble.txt, Realizations, Batch Size, and Bins must be at least 1'))
+    return options
+
+# Settings of the solver service, which may all be given in any order
+serviceSettings = [
+    ("Port =", 'port', 1, getInteger, 8765),
+    ("Workers =", 'workers', 1, getInteger, 0),
+    ("Batch Size =", 'batchSize', 1, getInteger, 16),
+    ("Warm Plotting =", 'warmPlotting', 1, getTruth, False),
+    ]
+
+# Use readBench as a template for readService
+def readService(serviceFile):
+    # Define a variable to use in error messages
+    s = 'service'
+    lineNum = 0
+
+    # Start the settings at their default values
+    options = {name : default for (expected, name, argNum, getValue, default) in serviceSettings}
+
+    for line in serviceFile:
+        lineNum += 1
+
+        # Remove whitespace and make all letters lowercase
+        line = ''.join(line.split()).lower()
+
+        # Ignore commented and empty lines
+        if line != '' and line[0] != '#':
+            getOptional(line, lineNum, s, serviceSettings, options)
 
-    return (run, generate, multiple, significance, plot, userInput, image1Name, image2Name, image3Name, coarseNum, mediumNum, fineNum, numList)
+    return options
@@ -0,0 +1,111 @@
+from os import listdir, stat
+from os.path import basename, isfile, join
+import sqlite3
+from read import readOutput
+from compression import openFile, removeCompression, findFile
+
+
+# The registry is a SQLite database in the output directory with one row for each output file
+# Run numbers are the primary key and paths are indexed so that runs are found without opening their output files
+registryName = 'runs.db'
+registryColumns = ('number', 'path', 'binaryPath', 'modified',
+    'lambda_A', 'lambda_B', 'N_A0', 'N_B0', 'N_C0', 'delta_t', 't_final', 'integrator',
+    'analyticalMaxN_B', 'analyticalMaxTime', 'numericalMaxN_B', 'numericalMaxTime', 'rows', 'dataOffset')
+
+def openRegistry(directory):
+    # Open or create the registry in the directory
+    registry = sqlite3.connect(join(directory, registryName))
+    registry.execute('CREATE TABLE IF NOT EXISTS runs (number INTEGER PRIMARY KEY, path TEXT, binaryPath TEXT, modified REAL, '
+        'lambda_A REAL, lambda_B REAL, N_A0 REAL, N_B0 REAL, N_C0 REAL, delta_t REAL, t_final REAL, integrator TEXT, '
+        'analyticalMaxN_B REAL, analyticalMaxTime REAL, numericalMaxN_B REAL, numericalMaxTime REAL, rows INTEGER, dataOffset INTEGER)')
+    registry.execute('CREATE INDEX IF NOT EXISTS runsByPath ON runs (path)')
+
+    # Cached results are recorded with their size and the last time they were used so that the least recently used can be removed first,
+    # and with whether they changed significantly from the previous level and the significance they were compared with
+    registry.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, bytes INTEGER, binary INTEGER, lastUsed REAL, significance REAL, changed INTEGER)')
+    if 'changed' not in [column[1] for column in registry.execute('PRAGMA table_info(cache)')]:
+        # Registries made before the comparison was recorded have it added with no comparison for their cached results
+        registry.execute('ALTER TABLE cache ADD COLUMN significance REAL')
+        registry.execute('ALTER TABLE cache ADD COLUMN changed INTEGER')
+    registry.execute('CREATE INDEX IF NOT EXISTS cacheByLastUsed ON cache (lastUsed)')
+
+    # The first time the registry is opened, add the output files which are already in the directory
+    if registry.execute('SELECT COUNT(*) FROM runs').fetchone()[0] == 0:
+        for file in map(removeCompression, listdir(directory)):
+            if len(file) >= 10 and file[:6] == 'output' and file[-4:] == '.txt' and file[6:-4].isdigit():
+                indexOutput(registry, directory, int(file[6:-4]))
+        registry.commit()
+    return registry
+
+def indexOutput(registry, directory, number, integrator = 'euler', rows = None):
+    # Read only the header of an existing output file, the data tables start after its 23 lines
+    # The offset of the data tables in a compressed output file is where they start once it is decompressed
+    outputFile = openFile(findFile(join(directory, 'output' + str(number) + '.txt')), 'r')
+    try:
+        (inputValues, maxAnalyticalN_B, maxNumericalN_B, data) = readOutput(outputFile, excludeData = True)
+        outputFile.seek(0)
+        dataOffset = sum(len(outputFile.readline()) for lineNum in range(23))
+    except (ValueError, IndexError):
+        # Skip files which aren't output files
+        return
+    finally:
+        outputFile.close()
+
+    # The integrator isn't in the output file so it is given, or is forward Euler which was the only integrator before the registry
+    binaryPath = 'output' + str(number) + '.bin'
+    recordRun(registry, number, inputValues, integrator, maxAnalyticalN_B, maxNumericalN_B, dataOffset,
+        binaryPath if isfile(join(directory, binaryPath)) else None, directory, rows)
+
+def allocateRun(registry, directory):
+    # The next run number is one more than the largest registered number, skipping any output files made without the registry
+    number = registry.execute('SELECT COALESCE(MAX(number) + 1, 0) FROM runs').fetchone()[0]
+    while findFile(join(directory, 'output' + str(number) + '.txt')) != None:
+        number += 1
+
+    # Reserve the number until the run is recorded
+    registry.execute('INSERT INTO runs (number, path) VALUES (?, ?)', (number, 'output' + str(number) + '.txt'))
+    registry.commit()
+    return str(number)
+
+def releaseRun(registry, number):
+    # Remove the record of a run which was reserved but not finished so that its number can be used again
+    registry.execute('DELETE FROM runs WHERE number = ?', (int(number),))
+    registry.commit()
+
+def recordRun(registry, number, initialValues, integrator, analyticalMaxN_B, numericalMaxN_B, dataOffset, binaryPath = None, directory = '.', rows = None):
+    # Record everything about a finished run along with the time its output file was modified to detect changes to the file
+    # The output file has a row for every step unless the number of rows written is given, and is recorded with its compression's extension if it is compressed
+    path = basename(findFile(join(directory, 'output' + str(number) + '.txt')))
+    if rows == None:
+        rows = int(initialValues[-1] // initialValues[-2] + 1)
+    registry.execute('INSERT OR REPLACE INTO runs VALUES (' + ', '.join('?' * len(registryColumns)) + ')',
+        (int(number), path, binaryPath, stat(join(directory, path)).st_mtime, *initialValues, integrator,
+        *analyticalMaxN_B, *numericalMaxN_B, rows, dataOffset))
+    registry.commit()
+
+def isReserved(registry, number):
+    # Check that the run number was reserved but the run was never recorded, such as when the run was interrupted
+    row = registry.execute('SELECT modified FROM runs WHERE number = ?', (int(number),)).fetchone()
+    return row != None and row[0] == None
+
+def findShorterRun(registry, initialValues, integrator, binary, directory = '.'):
+    # Find the output file of the longest run with the same input values and integrator but an earlier final time, or None if there isn't one
+    # Only runs with every step written can be extended, and only runs with a binary sidecar if one is needed so that the sidecar has every digit of the values
+    rows = registry.execute('SELECT path, binaryPath, delta_t, t_final, rows FROM runs WHERE lambda_A = ? AND lambda_B = ? AND N_A0 = ? AND N_B0 = ? AND N_C0 = ? '
+        'AND delta_t = ? AND t_final < ? AND integrator = ? AND modified IS NOT NULL ORDER BY t_final DESC', (*initialValues, integrator)).fetchall()
+    for (path, binaryPath, delta_t, t_final, count) in rows:
+        if count == int(t_final // delta_t + 1) and (not binary or binaryPath != None) and findRun(registry, path, directory) != None:
+            return path
+    return None
+
+def findRun(registry, path, directory = '.'):
+    # Find the run of an output file by its path, returning a dictionary of the registry columns or None if it isn't registered
+    row = registry.execute('SELECT * FROM runs WHERE path = ?', (path,)).fetchone()
+    if row == None or row[registryColumns.index('modified')] == None:
+        return None
+    run = dict(zip(registryColumns, row))
+
+    # Ignore the record if the output file was changed or removed since it was recorded
+    if not isfile(join(directory, path)) or stat(join(directory, path)).st_mtime != run['modified']:
+        return None
+    return run
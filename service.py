@@ -0,0 +1,193 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from inspect import getsourcefile
+from math import isfinite
+from os.path import abspath, basename, dirname
+from os import chdir, cpu_count
+from threading import Lock
+import json
+from read import readInput
+from numerical import stepFunctions
+from sweep import runJob
+from query import querySolution
+
+
+# The names of the input values of a scenario given as JSON, in the order of the values in input.txt
+inputNames = ('lambda_A', 'lambda_B', 'N_A0', 'N_B0', 'N_C0', 'delta_t', 't_final')
+
+# The integrators a scenario may choose, the same as the integrators of the settings file
+scenarioIntegrators = (*stepFunctions, 'adaptive')
+
+def warmWorker(warmPlotting):
+    # Load everything a scenario uses and solve a small one when a worker is started, so that the first scenario it is given doesn't wait for it
+    solveScenario({'lambda_A' : 1, 'lambda_B' : 2, 'N_A0' : 1, 'N_B0' : 0, 'N_C0' : 0, 'delta_t' : 0.5, 't_final' : 1, 'times' : [0.25]},
+        {'integrator' : 'euler', 'chunkSize' : 2, 'significance' : 0.0005})
+    if warmPlotting:
+        import_module('plotting')
+
+def checkScenarioValues(values):
+    # The values must be finite numbers of at least 0 and the time delta must be greater than 0, or the solutions would be NaN or never finish
+    for name, value in zip(inputNames, values):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not isfinite(value) or value < 0:
+            raise(Exception('Expected ' + name + ' to be a number of at least 0, not ' + json.dumps(value)))
+    if values[-2] == 0:
+        raise(Exception('Expected delta_t to be greater than 0'))
+    return values
+
+def getScenarioValues(scenario):
+    # A scenario gives the text of an input file in the same format as input.txt, or each input value in seconds and atoms by name
+    if 'input' in scenario:
+        return checkScenarioValues(readInput(scenario['input'].splitlines()))
+    missing = [name for name in inputNames if name not in scenario]
+    if len(missing) > 0:
+        raise(Exception('Expected "input" or the values ' + ', '.join(inputNames) + ' in the scenario, missing ' + ', '.join(missing)))
+
+    # The times are kept as integers if they are whole, the same as readInput
+    values = checkScenarioValues(tuple(scenario[name] for name in inputNames))
+    return (*(float(value) for value in values[:5]), *(int(value) if value % 1 == 0 else float(value) for value in values[5:]))
+
+def getScenarioIntegrator(scenario, settings):
+    # A scenario may choose its own integrator, otherwise the integrator of the settings file is used
+    integrator = scenario.get('integrator', settings['integrator'])
+    if not isinstance(integrator, str) or integrator not in scenarioIntegrators:
+        raise(Exception('Expected the integrator to be one of ' + ', '.join(scenarioIntegrators) + ', not ' + json.dumps(integrator)))
+    return integrator
+
+def replaceNaN(value):
+    # JSON has no NaN or infinity, so values which aren't finite, such as the analytical max N_B when the rates are equal, are sent as null
+    if isinstance(value, float):
+        return value if isfinite(value) else None
+    if isinstance(value, dict):
+        return {key : replaceNaN(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [replaceNaN(item) for item in value]
+    return value
+
+# Solve one scenario in a worker and return its result as a dictionary to be sent back as JSON
+# Besides the max N_B, a scenario may ask for the counts at a list of "times" and for its reference graph to be saved as "image"
+def solveScenario(scenario, settings):
+    initialValues = getScenarioValues(scenario)
+    integrator = getScenarioIntegrator(scenario, settings)
+    (analyticalMaxN_B, numericalMaxN_B) = runJob(0, initialValues, integrator, settings['significance'], settings['chunkSize'])
+    result = {'initialValues' : list(initialValues), 'integrator' : integrator, 'analyticalMaxN_B' : list(analyticalMaxN_B), 'numericalMaxN_B' : list(numericalMaxN_B)}
+
+    # The counts at the times are found without solving every step, the same as querySolution
+    tolerance = settings['significance'] * sum(initialValues[2:5]) / 100
+    if 'times' in scenario:
+        data = querySolution(initialValues, scenario['times'], integrator, tolerance)
+        result['data'] = {name : column.tolist() for name, column in zip(data.names, data.columns)}
+
+    # Images are saved in the directory of the service, so only the name of the image is used
+    if 'image' in scenario:
+        from plotting import makeReferenceGraph
+        makeReferenceGraph(initialValues, integrator, tolerance, settings['chunkSize'], basename(scenario['image']))
+        result['image'] = basename(scenario['image'])
+    return result
+
+def trySolveScenario(scenario, settings):
+    # Return an error for the scenario instead of raising it so that the other scenarios of the request are still solved
+    try:
+        return solveScenario(scenario, settings)
+    except Exception as error:
+        return {'error' : str(error)}
+
+def readScenarios(body, contentType):
+    # A request is the text of an input file, a JSON scenario, or a JSON list of scenarios
+    if contentType.split(';')[0].strip() != 'application/json':
+        return [{'input' : body.decode()}]
+    scenarios = json.loads(body)
+    return scenarios if isinstance(scenarios, list) else [scenarios]
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    # Each request is handled in its own thread, which waits for its scenarios to be solved by the workers shared by every request
+
+    def do_GET(self):
+        # Report that the service is running and how many workers it has
+        if self.path != '/status':
+            self.send_error(404)
+            return
+        self.sendJSON({'workers' : self.server.workers, 'solved' : self.server.solved})
+
+    def do_POST(self):
+        if self.path != '/solve':
+            self.send_error(404)
+            return
+        try:
+            scenarios = readScenarios(self.rfile.read(int(self.headers.get('Content-Length', 0))), self.headers.get('Content-Type', ''))
+        except (ValueError, UnicodeDecodeError) as error:
+            self.send_error(400, 'Expected the text of an input file or JSON scenarios: ' + str(error))
+            return
+
+        # An unknown integrator is checked for before any scenario is solved, since it is a mistake in the request rather than in the values of one scenario
+        try:
+            for index, scenario in enumerate(scenarios):
+                if isinstance(scenario, dict):
+                    getScenarioIntegrator(scenario, self.server.settings)
+        except Exception as error:
+            self.send_error(400, 'Scenario ' + str(index) + ': ' + str(error))
+            return
+
+        # Send the result of each scenario as a line of JSON as soon as it and the scenarios before it are solved, in the order of the scenarios
+        # The response has no length so that it is streamed, and it ends when the connection is closed
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        results = self.server.executor.map(partial(trySolveScenario, settings = self.server.settings), scenarios, chunksize = max(1, self.server.batchSize))
+        for index, result in enumerate(results):
+            self.wfile.write((json.dumps(replaceNaN({'index' : index, **result}), allow_nan = False) + '\n').encode())
+            self.wfile.flush()
+            with self.server.lock:
+                self.server.solved += 1
+
+    def sendJSON(self, value):
+        body = json.dumps(value, allow_nan = False).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Don't print every request
+        pass
+
+def startService(options, settings, port = None):
+    # Start the workers, which are kept running with everything loaded, and the server which sends them the scenarios it is given
+    workers = options['workers'] if options['workers'] > 0 else cpu_count()
+    server = ThreadingHTTPServer(('127.0.0.1', options['port'] if port == None else port), ServiceHandler)
+    server.executor = ProcessPoolExecutor(workers, initializer = warmWorker, initargs = (options['warmPlotting'],))
+    server.workers = workers
+    server.batchSize = options['batchSize']
+    server.settings = settings
+    server.solved = 0
+
+    # Requests are handled in their own threads, so the count of solved scenarios is only changed while holding the lock
+    server.lock = Lock()
+
+    # Start every worker now instead of when the first scenarios are given
+    list(server.executor.map(int, range(workers)))
+    return server
+
+
+if __name__ == '__main__':
+    from read import readService, readSettings
+
+    # Get the directory of service.py and make it the current working directory
+    directory = dirname(abspath(getsourcefile(lambda:0)))
+    chdir(directory)
+
+    # Read the service file, and the settings file for the integrator, chunk size, and significance used by main
+    options = readService(open('service.txt'))
+    (run, generate, multiple, significance, plot, *plotInfo, settings) = readSettings(open('settings.txt'))
+
+    # Serve scenarios until the service is stopped
+    server = startService(options, {'integrator' : settings['integrator'], 'chunkSize' : settings['chunkSize'], 'significance' : significance})
+    print('Solving scenarios at http://127.0.0.1:{}/solve'.format(server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    server.executor.shutdown()
@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from inspect import getsourcefile
+from itertools import product
+from os.path import abspath, dirname, join
+from os import chdir, cpu_count, makedirs
+from analytical import calculateAnalyticalMaxN_B
+from numerical import calculateNumericalMaxN_B
+from pipeline import levelChunks
+from write import writeOutput
+
+
+# Solve one job of a sweep and return its analytical and numerical max N_B and time
+# Jobs are solved in separate processes so everything they need is given as arguments
+def runJob(number, initialValues, integrator, significance, chunkSize, outputDirectory = None):
+    # The adaptive integrator keeps the error of each step within a hundredth of the significant difference, the same as in main
+    tolerance = significance * sum(initialValues[2:5]) / 100
+
+    # The analytical max N_B doesn't exist for every combination of inputs, such as equal decay rates, which shouldn't stop the rest of the sweep
+    try:
+        analyticalMaxN_B = calculateAnalyticalMaxN_B(*initialValues)
+    except (ValueError, ZeroDivisionError):
+        analyticalMaxN_B = (float('nan'), float('nan'))
+    numericalMaxN_B = calculateNumericalMaxN_B(levelChunks(initialValues, integrator, tolerance, chunkSize, analytical = False), initialValues[-2])
+
+    # Write the job's output file if asked for in the sweep file
+    if outputDirectory != None:
+        writeOutput(open(join(outputDirectory, 'output' + str(number) + '.txt'), 'w'), levelChunks(initialValues, integrator, tolerance, chunkSize),
+            initialValues, analyticalMaxN_B, numericalMaxN_B)
+    return (analyticalMaxN_B, numericalMaxN_B)
+
+def runSweep(sweepValues, options, integrator, significance, chunkSize, outputDirectory = None):
+    # Expand the values of each input into a job for every combination of them
+    jobs = list(product(*sweepValues))
+    job = partial(runJob, integrator = integrator, significance = significance, chunkSize = chunkSize, outputDirectory = outputDirectory)
+
+    # Run the jobs in this process if only one worker is asked for, otherwise split them between a pool of processes
+    # Jobs are sent to the processes in batches and their results are given back in the order of the jobs
+    workers = options['workers'] if options['workers'] > 0 else cpu_count()
+    if workers == 1:
+        return (jobs, map(job, range(len(jobs)), jobs), None)
+    executor = ProcessPoolExecutor(workers)
+    return (jobs, executor.map(job, range(len(jobs)), jobs, chunksize = max(1, options['batchSize'])), executor)
+
+
+if __name__ == '__main__':
+    from read import readSweep, readSettings
+    from write import writeSweepOutput, getOutputNumber
+
+    # Get the directory of sweep.py and make it the current working directory
+    directory = dirname(abspath(getsourcefile(lambda:0)))
+    chdir(directory)
+
+    # Read the sweep file, and the settings file for the integrator and significance used by main
+    (*sweepValues, options) = readSweep(open('sweep.txt'))
+    (run, generate, multiple, significance, plot, *plotInfo, settings) = readSettings(open('settings.txt'))
+
+    # Number the summary file and make a folder with the same name for the output file of each job if asked for
+    sweepNum = getOutputNumber(directory, 'sweep')
+    outputDirectory = None
+    if options['writeOutputs']:
+        outputDirectory = 'sweep' + sweepNum
+        makedirs(outputDirectory, exist_ok = True)
+
+    # Run the sweep and write each job's result to the summary file as it is finished
+    (jobs, results, executor) = runSweep(sweepValues, options, settings['integrator'], significance, settings['chunkSize'], outputDirectory)
+    writeSweepOutput(open('sweep' + sweepNum + '.txt', 'w'), sweepValues, jobs, results)
+    if executor != None:
+        executor.shutdown()
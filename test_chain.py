@@ -0,0 +1,44 @@
+from decimal import Decimal, getcontext
+import numpy as np
+import pytest
+from chain import chainSolution
+
+
+def batemanReference(lambdas, N_0, t):
+    # The Bateman solution of a chain without branches starting with N_0 atoms of its first member, with enough digits that close rates don't lose precision
+    getcontext().prec = 80
+    rates = [Decimal(rate) for rate in lambdas]
+    t = Decimal(float(t))
+    counts = []
+    for j in range(len(rates)):
+        product = Decimal(1)
+        for rate in rates[:j]:
+            product *= rate
+        total = Decimal(0)
+        for i in range(j + 1):
+            denominator = Decimal(1)
+            for k in range(j + 1):
+                if k != i:
+                    denominator *= rates[k] - rates[i]
+            total += (-rates[i] * t).exp() / denominator
+        counts.append(float(Decimal(N_0) * product * total))
+    return np.array(counts)
+
+@pytest.mark.parametrize('spacing', [1e-2, 1e-3, 1e-4])
+def test_close_rates(spacing):
+    # Ten members with rates spacing apart, the last of which decays out of the chain
+    lambdas = [1e-3 * (1 + spacing * i) for i in range(10)]
+    counts = [100] + [0] * 9
+    t = np.array([0, 100, 1000, 5000, 20000])
+    N = chainSolution(lambdas, [], counts, t)
+    for row, time in zip(N, t):
+        reference = batemanReference(lambdas, 100, time)
+        assert np.allclose(row, reference, rtol = 1e-9, atol = 1e-9)
+        assert abs(row.sum() - reference.sum()) < 1e-9
+
+def test_total_conserved():
+    # A stable last member keeps every atom in the chain, including equal rates and a branch
+    lambdas = [1e-3, 1e-3, 1.0001e-3, 5e-2, 0]
+    N = chainSolution(lambdas, [(2, 3, 0.4), (2, 4, 0.6)], [100, 0, 0, 0, 0], np.linspace(0, 1e5, 101))
+    assert np.all(N >= 0)
+    assert np.allclose(N.sum(axis = 1), 100, rtol = 0, atol = 1e-9)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from numerical import numericalSolution, numericalSolutions
+
+
+def stepSolution(lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, size):
+    # Step through each of the first size steps one at a time with the forward Euler recurrence
+    values = (N_A0, N_B0, N_C0)
+    rows = [values]
+    for i in range(1, size):
+        # The placeholders of numericalSolution are the unused values of the initial values and a row of data
+        values = numericalSolution(lambda_A, lambda_B, None, None, None, delta_t, None, None, None, None, None, *values, None)[:3]
+        rows.append(values)
+    return np.array(rows)
+
+# Rates which are close, equal, or 0, where the closed form divides by differences which are small or 0
+lambda_A = 1.6e-4
+@pytest.mark.parametrize('lambdas', [(lambda_A, lambda_A * (1 + 1e-9)), (lambda_A, lambda_A * (1 + 1e-12)), (lambda_A, lambda_A), (lambda_A, 0), (0, lambda_A), (0, 0),
+    (lambda_A, 2 * lambda_A), (2 * lambda_A, lambda_A)])
+def test_closed_form_matches_stepping(lambdas):
+    # The closed form should give the same counts as stepping to within rounding errors, which are much less than an atom
+    size = 20000
+    stepped = stepSolution(*lambdas, 1e6, 1e5, 0, 1, size)
+    closed = np.array(numericalSolutions(*lambdas, 1e6, 1e5, 0, 1, size, np.arange(size))[:3]).T
+    assert np.all(np.isfinite(closed))
+    assert np.max(np.abs(closed - stepped)) < 1e-6
@@ -0,0 +1,11 @@
+import subprocess
+import sys
+from inspect import getsourcefile
+from os.path import abspath, dirname
+
+
+def test_main_imports_without_plotting_or_pools():
+    # Importing main in a new process shouldn't load matplotlib or process pools, which are only loaded when a run uses them
+    code = 'import sys, main; print(" ".join(name for name in ("matplotlib", "concurrent.futures", "multiprocessing") if name in sys.modules))'
+    loaded = subprocess.run([sys.executable, '-c', code], cwd = dirname(abspath(getsourcefile(lambda:0))), capture_output = True, text = True, check = True).stdout.split()
+    assert loaded == []
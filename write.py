@@ -1,17 +1,25 @@
 from os import listdir
+from functools import lru_cache
+from io import StringIO
 from math import log10, floor
+from struct import pack, calcsize
+from instrument import measure
+from compression import removeCompression
+import json
 
 
-def getOutputNumber(directory):
-    # List the files in the directory and add the file names starting with output and ending with .txt to a list after stripping the first and last portions
-    strippedFileNames = [file[6:-4] for file in listdir(directory) if len(file) >= 10 and file[:6] == 'output' and file[-4:] == '.txt']
+def getOutputNumber(directory, prefix = 'output', extension = '.txt'):
+    # List the files in the directory and add the file names starting with the prefix and ending with the extension to a list after stripping the first and last portions
+    # Compressed files are named with the compression's extension after the extension, which is removed first
+    files = [removeCompression(file) for file in listdir(directory)]
+    strippedFileNames = [file[len(prefix):-len(extension)] for file in files if len(file) >= len(prefix) + len(extension) and file[:len(prefix)] == prefix and file[-len(extension):] == extension]
 
     # List all output file numbers used
-    usedNumbers = []
+    usedNumbers = set()
     for name in strippedFileNames:
         # Check that the identified portion of the string is an integer
         try:
-            usedNumbers.append(int(name))
+            usedNumbers.add(int(name))
         except ValueError:
             pass
 
@@ -23,14 +31,14 @@ def getOutputNumber(directory):
     # Return the first unused number
     return str(number)
 
-def writeOutput(outputFile, data, initialValues, analyticalMaxN_B, numericalMaxN_B):
+def getTimeWidth(delta_t, t_final):
     # Get the maximum amount of space needed for a time value based on the time delta and the final time
-    if isinstance(initialValues[-2], int):
-        timeWidth = int(floor(log10(initialValues[-1])) + 1)
-    elif isinstance(initialValues[-2], float):
-        timeWidth = len(str(initialValues[-2]))
-        if initialValues[-1] >= 1:
-            timeWidth += int(floor(log10(initialValues[-1])) + 1)
+    if isinstance(delta_t, int):
+        timeWidth = int(floor(log10(t_final)) + 1)
+    elif isinstance(delta_t, float):
+        timeWidth = len(str(delta_t))
+        if t_final >= 1:
+            timeWidth += int(floor(log10(t_final)) + 1)
     else:
         # The time should always be either a float or an int
         raise ValueError('Time Delta should be a float or an int')
@@ -38,12 +46,63 @@ def writeOutput(outputFile, data, initialValues, analyticalMaxN_B, numericalMaxN
     # If less than 4 digits are required to represent the time, use 4 digits to contain the header
     if timeWidth < 4:
         timeWidth = 4
+    return timeWidth
 
-    # Write and close the output file using this information
-    writeInitial(outputFile, *initialValues)
-    writeOutputHeader(outputFile, timeWidth, analyticalMaxN_B, numericalMaxN_B)
-    writeData(outputFile, timeWidth, data)
+# The binary sidecar of an output file starts with a header holding the magic string, version, number of columns, number of rows,
+# input values, and analytical and numerical max N_B and time, padded to binaryHeaderSize bytes
+# It is followed by each column of the data tables in order as contiguous little endian float64 values
+binaryHeaderFormat = '<8sIIQ7d4d'
+binaryHeaderSize = 128
+binaryMagic = b'DECAYBIN'
+
+# chunks is an iterable of arrays of consecutive rows, each written as soon as it is given
+# rows is the number of rows in all of the chunks, which is every step between 0 <= t <= t_final unless only some steps are written
+# If start is given the first start rows were already written and the files are positioned after them, so only the rest of the rows are written
+# save is called with the number of rows and the position in the output file after each chunk is written, to keep a checkpoint of the files
+def writeOutput(outputFile, chunks, initialValues, analyticalMaxN_B, numericalMaxN_B, binaryFile = None, rows = None, start = 0, save = None):
+    # Get the width of the time column
+    timeWidth = getTimeWidth(initialValues[-2], initialValues[-1])
+    if rows == None:
+        rows = int(initialValues[-1] // initialValues[-2] + 1)
+
+    # Write and close the output file and binary sidecar if one is given using this information
+    # The header is written all at once and measured instead of asking where the data starts, which compressed files can't tell while they are written
+    dataOffset = None
+    if start == 0:
+        header = StringIO()
+        writeInitial(header, *initialValues)
+        writeOutputHeader(header, timeWidth, analyticalMaxN_B, numericalMaxN_B)
+        outputFile.write(header.getvalue())
+        dataOffset = len(header.getvalue())
+        if binaryFile != None:
+            writeBinaryHeader(binaryFile, rows, initialValues, analyticalMaxN_B, numericalMaxN_B)
+    for data in chunks:
+        with measure('write'):
+            writeData(outputFile, timeWidth, data, initialValues[-2])
+        if binaryFile != None:
+            with measure('write binary'):
+                writeBinaryData(binaryFile, rows, start, data)
+        start += len(data)
+        if save != None:
+            save(start, outputFile, binaryFile)
     outputFile.close()
+    if binaryFile != None:
+        binaryFile.close()
+
+    # Return where the data tables start in the output file, or None if the header was already written
+    return dataOffset
+
+def writeBinaryHeader(binaryFile, rows, initialValues, analyticalMaxN_B, numericalMaxN_B):
+    # Write the header and make room for every column so that each chunk can be written into its place
+    header = pack(binaryHeaderFormat, binaryMagic, 1, 8, rows, *initialValues, *analyticalMaxN_B, *numericalMaxN_B)
+    binaryFile.write(header + bytes(binaryHeaderSize - calcsize(binaryHeaderFormat)))
+    binaryFile.truncate(binaryHeaderSize + 8 * 8 * rows)
+
+def writeBinaryData(binaryFile, rows, start, data):
+    # Write each column of the chunk into its column starting at the chunk's first row, the columns of a dataset are contiguous so they are written without copying
+    for i in range(8):
+        binaryFile.seek(binaryHeaderSize + 8 * (i * rows + start))
+        binaryFile.write(data.columns[i].astype('<f8', copy = False))
 
 def writeInitial(outputFile, lambda_A, lambda_B, N_A0, N_B0, N_C0, delta_t, t_final):
     # Rewrite the initial file but with units of atoms and seconds or seconds inverse
@@ -71,8 +130,143 @@ def writeOutputHeader(outputFile, timeWidth, analyticalMaxN_B, numericalMaxN_B):
         '-' * timeWidth + ('     ' + '-' * 14 + '|' + '-' * 14 + '|' + '-' * 14) * 2 + '|' + '-' * 14 + '\n'
         ).format(*analyticalMaxN_B, *numericalMaxN_B, 'Time', 'Analytical', 'Numerical', '(s)', 'N (A)', 'N (B)', 'N (C)', 'N (total)'))
 
-def writeData(outputFile, timeWidth, data):
-    # Write the values for each data point
-    for point in data:
-        outputFile.write(('{:>' + str(timeWidth) + '}     '
-            '{:<14.9G}|{:<14.9G}|{:<14.9G}     {:<14.9G}|{:<14.9G}|{:<14.9G}|{:<14.9G}\n').format(*point))
+# Number of rows formatted together and written to the output file at once
+blockRows = 4096
+
+@lru_cache(maxsize = 16)
+def getBlockFormat(timeWidth, rows):
+    # Compile the format of a block of rows once, %-14.9G formats the same as {:<14.9G} and %s formats times the same as {}
+    return ('%' + str(timeWidth) + 's     %-14.9G|%-14.9G|%-14.9G     %-14.9G|%-14.9G|%-14.9G|%-14.9G\n') * rows
+
+def writeData(outputFile, timeWidth, data, delta_t):
+    # Write the times as whole numbers of seconds if the time delta is an integer, and the first time as the integer 0 it was given as
+    times = data.t.astype(type(delta_t)).tolist()
+    if len(times) > 0 and times[0] == 0:
+        times[0] = 0
+
+    # Format and write a block of rows at a time with the values of each row next to each other in one flat list
+    for start in range(0, len(data), blockRows):
+        rows = min(blockRows, len(data) - start)
+        values = [None] * (8 * rows)
+        values[0::8] = times[start : start + rows]
+        for i in range(1, 8):
+            values[i::8] = data.columns[i][start : start + rows].tolist()
+        outputFile.write(getBlockFormat(timeWidth, rows) % tuple(values))
+
+def writeChainOutput(outputFile, t, N, names, lambdas, counts, branches, delta_t, t_final):
+    # Get the width of the time column
+    timeWidth = getTimeWidth(delta_t, t_final)
+
+    # Rewrite the chain file with units of atoms and seconds or seconds inverse
+    outputFile.write('Input Data\n----------\n\n')
+    for name, lambda_, count in zip(names, lambdas, counts):
+        outputFile.write('Member {} : Decay Rate = {} /s, Initial Count = {}\n'.format(name, lambda_, count))
+    for parent, daughter, ratio in branches:
+        outputFile.write('Branch {} -> {} : {}\n'.format(names[parent], names[daughter], ratio))
+    outputFile.write('Time Delta = {} s\nFinal Time = {} s\n\n\n'.format(delta_t, t_final))
+
+    # Write the header of the data table with one column for each member
+    outputFile.write('Output Data\n-----------\n\n' +
+        '{:^{}}     '.format('Time', timeWidth) + '|'.join('{:^14}'.format(name[:14]) for name in names) + '\n' +
+        '{:^{}}     '.format('(s)', timeWidth) + '|'.join('{:^14}'.format('N') for name in names) + '\n' +
+        '-' * timeWidth + '     ' + '|'.join('-' * 14 for name in names) + '\n')
+
+    # Write the values for each time, N has one row for each time and one column for each member
+    rowFormat = '{:>' + str(timeWidth) + '}     ' + '|'.join('{:<14.9G}' for name in names) + '\n'
+    for time, row in zip(t, N.tolist()):
+        outputFile.write(rowFormat.format(time, *row))
+    outputFile.close()
+
+def writeSweepOutput(summaryFile, sweepValues, jobs, results):
+    # Rewrite the swept values of each input with units of atoms and seconds or seconds inverse
+    summaryFile.write('Input Data\n----------\n\n')
+    for name, unit, values in zip(('Decay Rate A', 'Decay Rate B', 'Initial Count A', 'Initial Count B', 'Initial Count C', 'Time Delta', 'Final Time'),
+            (' /s', ' /s', '', '', '', ' s', ' s'), sweepValues):
+        summaryFile.write('{} = {}{}\n'.format(name, ', '.join(str(value) for value in values), unit))
+    summaryFile.write('\n\n')
+
+    # Write the header of the summary table with one row for each job
+    jobWidth = max(3, len(str(len(jobs) - 1)))
+    names = ('Decay Rate A', 'Decay Rate B', 'N (A) at t=0', 'N (B) at t=0', 'N (C) at t=0', 'Time Delta', 'Final Time', 'Max N (B)', 'Time', 'Max N (B)', 'Time')
+    units = ('(/s)', '(/s)', '', '', '', '(s)', '(s)', 'Analytical', '(s)', 'Numerical', '(s)')
+    summaryFile.write('Output Data\n-----------\n\n' +
+        '{:^{}}     '.format('Job', jobWidth) + '|'.join('{:^14}'.format(name) for name in names) + '\n' +
+        '{:^{}}     '.format('', jobWidth) + '|'.join('{:^14}'.format(unit) for unit in units) + '\n' +
+        '-' * jobWidth + '     ' + '|'.join('-' * 14 for name in names) + '\n')
+
+    # Write each job's input values and max N_B as its result is given, results are given in the order of the jobs
+    rowFormat = '{:>' + str(jobWidth) + '}     ' + '|'.join('{:<14.9G}' for name in names) + '\n'
+    for number, (initialValues, (analyticalMaxN_B, numericalMaxN_B)) in enumerate(zip(jobs, results)):
+        summaryFile.write(rowFormat.format(number, *initialValues, *analyticalMaxN_B, *numericalMaxN_B))
+    summaryFile.close()
+
+def writeLevelReport(outputFile, stages):
+    # Write a summary of the measured stages of a level after the data tables, separated from them by a blank line so that the tables are read up to it
+    outputFile.write('\n\nRun Report\n----------\n\n' +
+        '{:<14}|{:^14}|{:^14}|{:^20}\n'.format('Stage', 'Seconds', 'Calls', 'Peak Memory (bytes)') +
+        '-' * 14 + '|' + '-' * 14 + '|' + '-' * 14 + '|' + '-' * 20 + '\n')
+    for stage, record in stages.items():
+        outputFile.write('{:<14}|{:<14.6G}|{:<14}|{:<20}\n'.format(stage, record['seconds'], record['calls'], '' if record['peakBytes'] == None else record['peakBytes']))
+    outputFile.close()
+
+def writeRunReport(reportFile, report):
+    # Write the report of a run as JSON
+    json.dump(report, reportFile, indent = 1)
+    reportFile.close()
+
+def writeEnsembleOutput(ensembleFile, initialValues, options, times, analytical, numerical, means, variances, percentiles):
+    # Rewrite the input values with units of atoms and seconds or seconds inverse, and the settings of the ensemble
+    ensembleFile.write('Input Data\n----------\n\n')
+    for name, unit, value in zip(('Decay Rate A', 'Decay Rate B', 'Initial Count A', 'Initial Count B', 'Initial Count C', 'Time Delta', 'Final Time'),
+            (' /s', ' /s', '', '', '', ' s', ' s'), initialValues):
+        ensembleFile.write('{} = {}{}\n'.format(name, value, unit))
+    ensembleFile.write('Realizations = {}\nSeed = {}\n\n\n'.format(options['realizations'], options['seed']))
+
+    # Write the header of the table, with the analytical and numerical counts followed by the mean, variance, and percentiles of each count over the realizations
+    statistics = ['Mean', 'Variance'] + ['{:g}th Pct'.format(percentile) for percentile in options['percentiles']]
+    names = ['Time'] + ['N ({})'.format(atom) for atom in 'ABC'] * 2 + ['N ({})'.format(atom) for atom in 'ABC' for statistic in statistics]
+    units = ['(s)'] + ['Analytical'] * 3 + ['Numerical'] * 3 + statistics * 3
+    ensembleFile.write('Output Data\n-----------\n\n' +
+        '|'.join('{:^14}'.format(name) for name in names) + '\n' +
+        '|'.join('{:^14}'.format(unit) for unit in units) + '\n' +
+        '|'.join('-' * 14 for name in names) + '\n')
+
+    # Write a row for each time
+    rowFormat = '|'.join('{:<14.9G}' for name in names) + '\n'
+    for i in range(len(times)):
+        ensemble = [value for j in range(3) for value in (means[i, j], variances[i, j], *(percentile[i, j] for percentile in percentiles))]
+        ensembleFile.write(rowFormat.format(times[i], *(N[i] for N in analytical), *(N[i] for N in numerical), *ensemble))
+    ensembleFile.close()
+
+def writeConvergenceOutput(convergenceFile, initialValues, integrator, results, extrapolated, analyticalMaxTime):
+    # Rewrite the input values with units of atoms and seconds or seconds inverse, and the integrator
+    convergenceFile.write('Input Data\n----------\n\n')
+    for name, unit, value in zip(('Decay Rate A', 'Decay Rate B', 'Initial Count A', 'Initial Count B', 'Initial Count C', 'Time Delta', 'Final Time'),
+            (' /s', ' /s', '', '', '', ' s', ' s'), initialValues):
+        convergenceFile.write('{} = {}{}\n'.format(name, value, unit))
+    convergenceFile.write('Integrator = {}\n\n\n'.format(integrator))
+
+    # Write a row for each level with the error norms and observed order of each count, and the time of the max N_B found between the steps
+    names = ['Time Delta', 'Rows'] + ['N ({})'.format(atom) for atom in 'ABC' for statistic in range(3)] + ['Max N (B)']
+    units = ['(s)', ''] + ['Max Error', 'L2 Error', 'Order'] * 3 + ['Time (s)']
+    convergenceFile.write('Output Data\n-----------\n\n' +
+        '|'.join('{:^14}'.format(name) for name in names) + '\n' +
+        '|'.join('{:^14}'.format(unit) for unit in units) + '\n' +
+        '|'.join('-' * 14 for name in names) + '\n')
+    for result in results:
+        values = [result['delta_t'], result['rows']]
+        for name in ('N_A', 'N_B', 'N_C'):
+            order = result.get('orders', {}).get(name)
+            values += [result['norms'][name]['max'], result['norms'][name]['L2'], '' if order == None else order]
+        convergenceFile.write('|'.join('{:<14.9G}'.format(value) if value != '' else ' ' * 14 for value in values + [result['maxTime']]) + '\n')
+
+    # Write the error of the Richardson extrapolation of the two finest levels, and its max N_B time next to the analytical time
+    convergenceFile.write('\n\nRichardson Extrapolation\n------------------------\n\n')
+    if extrapolated['order'] == None:
+        convergenceFile.write('The finest level is used without extrapolation since ' + extrapolated['reason'] + '\n')
+    else:
+        convergenceFile.write('Order = {}\n'.format(extrapolated['order']))
+    for name in ('N_A', 'N_B', 'N_C'):
+        convergenceFile.write('N ({}) : Max Error = {:.9G}, L2 Error = {:.9G}\n'.format(name[-1], extrapolated['norms'][name]['max'], extrapolated['norms'][name]['L2']))
+    convergenceFile.write('Max N (B) Time = {:.9G} s, Analytical = {:.9G} s\n'.format(extrapolated['maxTime'], analyticalMaxTime))
+    convergenceFile.close()